@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# Banc de mesure et de non-régression de la génération des boites.
+# Parcourt une grille de paramètres (nombre de languettes, trait de coupe,
+# coins, couvercle, séparation forcée) et mesure pour chaque fonction de
+# dessin le débit (appels/s) et le pic de mémoire (tracemalloc).
+# Les chaînes 'd' de chaque point de la grille sont comparées à des
+# empreintes de référence (bench/golden.json, écrites par le moteur de
+# référence : le code d'origine) : une optimisation doit donner exactement
+# le même tracé.
+# effect() est mesuré sur un document SVG minimal si inkex est installé.
+# Le temps d'import des modules (python -X importtime) est comparé à un
+# budget : la géométrie doit s'importer vite et sans inkex ni lxml.
+# Quelques contrôles de bout en bout lancent le générateur en lot comme en
+# ligne de commande (fusion des bords communs...).
+#
+#   python bench/bench_boite_brique.py                  # mesure et vérifie
+#   python bench/bench_boite_brique.py --check          # vérifie seulement
+#   python bench/bench_boite_brique.py --update-golden  # réécrit les références
+#   python bench/bench_boite_brique.py --startup        # temps d'import seulement
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(HERE, '..', 'boite_brique')
+sys.path.insert(0, SOURCE)
+
+from boite_brique_geometry import BoxGeometry, PathBuffer, options_from_spec
+from reference_engine import ReferenceBox
+
+GOLDEN = os.path.join(HERE, 'golden.json')
+TAB_COUNTS = (1, 2, 3, 5, 10, 25, 50, 100, 200, 299)
+KERFS = (0.0, 0.2)
+# Budget du temps d'import cumulé (ms) des modules sans inkex, et modules
+# qu'ils ne doivent pas charger
+IMPORT_BUDGETS = {'boite_brique_geometry': 40.0, 'boite_brique_validate': 80.0}
+FORBIDDEN_IMPORTS = ('inkex', 'lxml')
+
+STUB_SVG = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" '
+            'xmlns:sodipodi="http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd" '
+            'width="1000mm" height="1000mm" viewBox="0 0 1000 1000">\n'
+            '<sodipodi:namedview id="namedview"/>\n'
+            '</svg>\n')
+
+
+def grid():
+    """ Yield (key, spec) for every point of the parameter grid
+    """
+    for num_tab, kerf, corners, cover, separation in itertools.product(
+            TAB_COUNTS, KERFS, (True, False), (True, False), (False, True)):
+        key = 'tabs=%d kerf=%r corners=%d cover=%d separation=%d' % (num_tab, kerf, corners, cover, separation)
+        yield key, {'width': 180.0, 'length': 240.0, 'height': 90.0, 'thickness': 3.0,
+                    'num_tab_Width': num_tab, 'num_tab_Length': num_tab, 'num_tab_Height': num_tab,
+                    'bymaterial': False, 'kerf_size': kerf, 'corners': corners,
+                    'aveccouvercle': cover, 'forcingseparation': separation}
+
+
+def digest(panels):
+    """ Return the sha256 of the (id suffix, 'd') of the six panels
+    """
+    text = '\n'.join('%s %s' % (suffix, d) for suffix, d in panels)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def drawers(geometry):
+    """ Return {name: callable} of the measured functions for one geometry
+    """
+    layout = geometry.panel_layout()
+
+    def draw(kind):
+        calls = [(getattr(geometry, 'draw_' + kind), x, y, side, flag)
+                 for suffix, k, x, y, side, flag in layout if k == kind]
+
+        def run():
+            for function, x, y, side, flag in calls:
+                function(x, y, geometry.aveccouvercle, side, flag).to_d()
+        return run
+    return {'draw_top_bottom': draw('top_bottom'),
+            'draw_short_side': draw('short_side'),
+            'draw_long_side': draw('long_side'),
+            'panels_d': geometry.panels_d}
+
+
+def effect_runner():
+    """ Return a function running the Inkscape effect on a stub document for
+        a spec, or None when inkex is not installed
+    """
+    try:
+        from boite_brique import LasercutBox
+    except ImportError:
+        return None
+    directory = tempfile.mkdtemp(prefix='boite_brique_bench')
+    document = os.path.join(directory, 'stub.svg')
+    with open(document, 'w', encoding='utf-8') as f:
+        f.write(STUB_SVG)
+    output = os.path.join(directory, 'out.svg')
+
+    def run(spec):
+        args = ['--%s=%s' % (name, str(value).lower() if isinstance(value, bool) else value)
+                for name, value in spec.items()]
+        LasercutBox().run([document, '--output=' + output] + args)
+    return run
+
+
+def buffer_extents(path):
+    """ Return (xmin, ymin, xmax, ymax) of a PathBuffer from its exact
+        numbers, moves included (as d_extents)
+    """
+    x = y = 0.0
+    xmin = ymin = float('inf')
+    xmax = ymax = float('-inf')
+    values = iter(path.coords)
+    for op in path.ops:
+        if op == PathBuffer.MOVE_TO:
+            x, y = next(values), next(values)
+        elif op == PathBuffer.MOVE:
+            x += next(values)
+            y += next(values)
+        elif op == PathBuffer.V:
+            y += next(values)
+        else: # SKIP et H
+            x += next(values)
+        xmin, ymin = min(xmin, x), min(ymin, y)
+        xmax, ymax = max(xmax, x), max(ymax, y)
+    return xmin, ymin, xmax, ymax
+
+
+def check_golden(update=False):
+    """ Compare the 'd' strings of the grid with the golden digests (or write
+        them with update, from the reference engine: the original drawing code
+        written as inkex does). The PathBuffer paths must also give the same
+        strings and the closed-form extents must be those of the paths.
+        Returns the number of differences.
+    """
+    digests = {}
+    failures = 0
+    for key, spec in grid():
+        geometry = BoxGeometry.from_options(options_from_spec(spec))
+        if update:
+            digests[key] = digest(ReferenceBox(geometry).panels_d())
+            continue
+        panels = geometry.panels_d()
+        buffers = geometry.panels()
+        if [(suffix, path.to_d()) for suffix, path in buffers] != panels:
+            print("PathBuffer and PathText paths differ: %s" % key)
+            failures += 1
+        # 'd' n'a que 6 chiffres significatifs : les emprises sont comparées aux valeurs exactes
+        for (suffix, path), (_, extents) in zip(buffers, geometry.panel_extents()):
+            if any(abs(a - b) > 1e-9 for a, b in zip(buffer_extents(path), extents)):
+                print("closed-form extents differ from the path: %s %s" % (key, suffix))
+                failures += 1
+        digests[key] = digest(panels)
+    if update:
+        with open(GOLDEN, 'w', encoding='utf-8') as f:
+            json.dump(digests, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print("%d golden digest(s) written to %s" % (len(digests), GOLDEN))
+        return failures
+    try:
+        with open(GOLDEN, encoding='utf-8') as f:
+            golden = json.load(f)
+    except FileNotFoundError:
+        print("no golden file, run with --update-golden first")
+        return 1
+    for key, value in digests.items():
+        if golden.get(key) != value:
+            print("geometry changed: %s" % key)
+            failures += 1
+    for key in set(golden) - set(digests):
+        print("golden entry not in the grid: %s" % key)
+        failures += 1
+    print("%d grid point(s) checked, %d difference(s)" % (len(digests), failures))
+    return failures
+
+
+def run_batch(specs, *args):
+    """ Run boite_brique_batch.py on a list of spec dicts (JSON lines) with
+        the command line args, in a temporary directory.
+        Returns (return code, stderr, {output name: bytes}).
+    """
+    directory = tempfile.mkdtemp(prefix='boite_brique_check')
+    filename = os.path.join(directory, 'specs.jsonl')
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(spec) + '\n' for spec in specs)
+    result = subprocess.run([sys.executable, os.path.join(SOURCE, 'boite_brique_batch.py'), filename] + list(args),
+                            cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    outputs = {}
+    for name in os.listdir(directory):
+        if name != 'specs.jsonl':
+            with open(os.path.join(directory, name), 'rb') as f:
+                outputs[name] = f.read()
+    return result.returncode, result.stderr, outputs
+
+
+def check_merge():
+    """ --merge on real specs (spacing of 2 mm) must shorten the cut of every
+        sheet. Returns the number of failures.
+    """
+    specs = [{'width': width, 'length': length, 'height': 40.0, 'bymaterial': False, 'kerf_size': 0.1}
+             for width, length in itertools.product((60.0, 80.0, 100.0), (90.0, 120.0))] * 3
+    code, errors, outputs = run_batch(specs, '--combined', 'sheets.svg', '--sheet', '600x400', '--merge')
+    lengths = [(float(before), float(after))
+               for before, after in re.findall(r'cut length ([\d.]+) -> ([\d.]+)', errors)]
+    if code or not lengths or any(after >= before for before, after in lengths):
+        print("--merge does not shorten the cut: %s" % errors.strip())
+        return 1
+    print("--merge: cut length %.1f -> %.1f" % (sum(b for b, a in lengths), sum(a for b, a in lengths)))
+    return 0
+
+
+def check_cut_order():
+    """ A nesting level made of a single 0.05 mm fragment far from the head
+        (as --merge can leave) must be ordered at once. Returns the number of failures.
+    """
+    from boite_brique_cutorder import CutPath, optimize
+    fragment = CutPath([(500.0, 300.0), (500.05, 300.0)])
+    outline = CutPath([(0.0, 0.0), (600.0, 0.0), (600.0, 400.0), (0.0, 400.0), (0.0, 0.0)])
+    start = time.perf_counter()
+    ordered = optimize([outline, fragment])
+    elapsed = time.perf_counter() - start
+    if elapsed > 0.5 or [path.points[0] for path in ordered] != [(500.0, 300.0), (600.0, 400.0)]:
+        print("cut order of a lone fragment: %.3f s" % elapsed)
+        return 1
+    return 0
+
+
+def check_gcode_units():
+    """ The G-code of a box drawn in cm must be the one of the same box in mm,
+        with no negative coordinate (origin at the bottom left corner), and
+        the feeds of a box in inches must be converted to in/min.
+        Returns the number of failures.
+    """
+    box = {'width': 10.0, 'length': 12.0, 'height': 5.0, 'thickness': 0.3,
+           'distance_between_side': 0.2, 'bymaterial': False, 'kerf_size': 0.0}
+    numbers = []
+    for units, scale in (('cm', 1.0), ('mm', 10.0)):
+        spec = {name: value * scale for name, value in box.items() if isinstance(value, float)}
+        spec.update(units=units, bymaterial=False)
+        code, errors, outputs = run_batch([spec], '--combined', 'box.gcode')
+        if code:
+            print("G-code in %s failed: %s" % (units, errors.strip()))
+            return 1
+        numbers.append([float(value) for value in re.findall(r'[XY](-?[\d.]+)', outputs['box.gcode'].decode('utf-8'))])
+    if len(numbers[0]) != len(numbers[1]) or any(abs(a - b) > 1e-3 for a, b in zip(*numbers)):
+        print("G-code of a box in cm is not the same box in mm")
+        return 1
+    if min(numbers[1]) < 0.0:
+        print("G-code has negative coordinates: %r" % min(numbers[1]))
+        return 1
+    spec = {name: value / 2.54 for name, value in box.items() if isinstance(value, float)}
+    spec.update(units='in', bymaterial=False)
+    code, errors, outputs = run_batch([spec], '--combined', 'box.gcode', '--laser-profile', '#660066=635:1000')
+    feeds = set(re.findall(r'F([\d.]+)', outputs.get('box.gcode', b'').decode('utf-8')))
+    if code or feeds != {'25.0'}:
+        print("G-code in inches does not convert the feed to in/min: %s" % (errors.strip() or sorted(feeds)))
+        return 1
+    return 0
+
+
+def check_pipeline():
+    """ Run the end-to-end checks of the batch generator, return the number of failures
+    """
+    return check_merge() + check_cut_order() + check_gcode_units()
+
+
+def import_times(module):
+    """ Return {module: cumulative import time in ms} of a fresh interpreter
+        importing module (python -X importtime)
+    """
+    environment = dict(os.environ, PYTHONPATH=SOURCE)
+    environment.pop('PYTHONDONTWRITEBYTECODE', None) # mesurer avec les .pyc comme dans Inkscape
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode:
+        return None
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1000.0
+    return times
+
+
+def check_startup(repeat):
+    """ Print the import time of the modules (best of repeat runs) and compare
+        it with the budgets. Returns the number of failures.
+    """
+    failures = 0
+    modules = sorted(IMPORT_BUDGETS) + ['boite_brique']
+    for module in modules:
+        runs = [import_times(module) for _ in range(repeat + 1)][1:] # le premier écrit les .pyc
+        if None in runs:
+            if module in IMPORT_BUDGETS:
+                print("%-24s import failed" % module)
+                failures += 1
+            else:
+                print("%-24s not measured (inkex is not installed)" % module)
+            continue
+        best = min(times[module] for times in runs)
+        budget = IMPORT_BUDGETS.get(module)
+        if budget is None:
+            print("%-24s %8.1f ms" % (module, best))
+            continue
+        print("%-24s %8.1f ms (budget %.0f ms)" % (module, best, budget))
+        if best > budget:
+            print("%s: import slower than its budget" % module)
+            failures += 1
+        loaded = [name for name in runs[0] if name.split('.')[0] in FORBIDDEN_IMPORTS]
+        if loaded:
+            print("%s imports %s" % (module, ', '.join(sorted(loaded))))
+            failures += 1
+    return failures
+
+
+def measure(repeat):
+    """ Print ops/s and peak memory of each function, per tab count
+    """
+    run_effect = effect_runner()
+    names = ['draw_top_bottom', 'draw_short_side', 'draw_long_side', 'panels_d']
+    if run_effect is None:
+        print("inkex is not installed: effect() is skipped")
+    else:
+        names.append('effect')
+    print("%6s %-16s %12s %12s" % ("tabs", "function", "ops/s", "peak KiB"))
+    by_tabs = {}
+    for key, spec in grid():
+        by_tabs.setdefault(spec['num_tab_Width'], []).append(spec)
+    for num_tab, specs in sorted(by_tabs.items()):
+        geometries = [BoxGeometry.from_options(options_from_spec(spec)) for spec in specs]
+        functions = [drawers(geometry) for geometry in geometries]
+        for name in names:
+            if name == 'effect':
+                calls = [lambda spec=spec: run_effect(spec) for spec in specs]
+            else:
+                calls = [function[name] for function in functions]
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for call in calls:
+                    call()
+                best = min(best, time.perf_counter() - start)
+            peak = 0
+            for call in calls:
+                tracemalloc.start()
+                call()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            print("%6d %-16s %12.1f %12.1f" % (num_tab, name, len(calls) / best, peak / 1024.0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark and golden output check of the box generation")
+    parser.add_argument("--repeat",
+                        type=int, default=5,
+                        help="Number of runs per measure (the best one is kept)")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--check",
+                        action="store_true",
+                        help="Only check the output (golden digests, end-to-end checks) and the import time (budgets)")
+    action.add_argument("--update-golden",
+                        dest="update_golden", action="store_true",
+                        help="Write the golden digests from the reference engine (original drawing code)")
+    action.add_argument("--startup",
+                        action="store_true",
+                        help="Only compare the import time of the modules with their budget")
+    args = parser.parse_args(argv)
+    if args.startup:
+        return 1 if check_startup(max(1, args.repeat)) else 0
+    failures = check_golden(args.update_golden)
+    if not args.update_golden:
+        failures += check_pipeline()
+        failures += check_startup(max(1, args.repeat))
+    if not (args.check or args.update_golden):
+        measure(max(1, args.repeat))
+    return 1 if failures else 0
+
+###
+if __name__ == '__main__':
+    sys.exit(main())
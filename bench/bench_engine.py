@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# Compare les deux sorties de draw_* : PathBuffer + to_d et PathText
+# (panels_d, sans puis avec le cache des bords) : les chaînes 'd' doivent
+# être identiques octet pour octet entre elles et avec le moteur de
+# référence (code d'origine, listes de commandes écrites comme inkex).
+#
+#   python bench/bench_engine.py [--repeat 20]
+
+import argparse
+import itertools
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'boite_brique'))
+
+from boite_brique_geometry import BoxGeometry, options_from_spec, tab_run
+from reference_engine import ReferenceBox
+
+
+def reference_engine(geometry):
+    return ReferenceBox(geometry).panels_d()
+
+
+def buffer_engine(geometry):
+    return [(suffix, path.to_d()) for suffix, path in geometry.panels()]
+
+
+def text_engine(geometry):
+    return geometry.panels_d()
+
+
+def cold_engine(boxes):
+    """ PathText paths with an empty edge cache for every box
+    """
+    for geometry in boxes:
+        tab_run.cache_clear()
+        geometry.panels_d()
+
+
+def geometries(num_tab):
+    for cover, corners, kerf in itertools.product((True, False), (True, False), (0.0, 0.2)):
+        spec = {'width': 180.0, 'length': 240.0, 'height': 90.0, 'thickness': 3.0,
+                'num_tab_Width': num_tab, 'num_tab_Length': num_tab, 'num_tab_Height': num_tab,
+                'aveccouvercle': cover, 'corners': corners, 'bymaterial': False, 'kerf_size': kerf}
+        yield BoxGeometry.from_options(options_from_spec(spec))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the panel path engines")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of runs per measure")
+    args = parser.parse_args(argv)
+
+    print("%8s %14s %14s %14s %8s" % ("tabs", "buffer (ms)", "text (ms)", "cached (ms)", "speedup"))
+    for num_tab in (1, 3, 10, 50, 100, 299):
+        boxes = list(geometries(num_tab))
+        for geometry in boxes:
+            reference = reference_engine(geometry)
+            if buffer_engine(geometry) != reference or text_engine(geometry) != reference:
+                print("Different geometry from the reference engine for %d tabs" % num_tab)
+                return 1
+        slow = min(timeit.repeat(lambda: [buffer_engine(g) for g in boxes], number=1, repeat=args.repeat))
+        fast = min(timeit.repeat(lambda: cold_engine(boxes), number=1, repeat=args.repeat))
+        cached = min(timeit.repeat(lambda: [text_engine(g) for g in boxes], number=1, repeat=args.repeat))
+        print("%8d %14.3f %14.3f %14.3f %7.1fx" % (num_tab, slow * 1000 / len(boxes), fast * 1000 / len(boxes),
+                                                  cached * 1000 / len(boxes), slow / fast))
+    return 0
+
+###
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# Moteur de référence : les fonctions de dessin de la version d'origine de
+# l'extension (listes ['h', [valeur]] par commande), recopiées telles
+# quelles, et l'écriture de inkex.paths.Path (nombres en "{:.6g}").
+# Les chaînes 'd' de BoxGeometry.panels_d() doivent lui être identiques
+# octet pour octet ; bench/golden.json est écrit à partir de ce moteur.
+
+
+def path_to_d(line_path):
+    """ Serialize a list of [command, [values]] as str(inkex.paths.Path) does
+    """
+    return ' '.join(('%s %s' % (command, ' '.join('{:.6g}'.format(value) for value in values))).strip()
+                    for command, values in line_path)
+
+
+class ReferenceBox(object):
+    """ The drawing code of the original extension, on the parameters of a
+        BoxGeometry (already corrected for thickness and kerf)
+    """
+
+    def __init__(self, geometry):
+        self.__dict__.update(vars(geometry))
+
+    def draw_top_bottom(self, startx, starty, boxCover, boxSide, masktop=False):
+        """ Return an SVG path for the top or bottom of box
+        """
+        line_path = []
+        line_path.append(['M', [startx, starty]])
+
+        # * Trace le dessus de la boite sans languettes
+        if boxSide in "Top" and not boxCover:
+            line_path.append(['m', [-self.materialThickness, -self.materialThickness]])
+            line_path.append(['h', [self.boxWidth+self.materialThickness*2]])
+            line_path.append(['v', [self.boxLength+self.materialThickness*2]])
+            line_path.append(['h', [-self.boxWidth-self.materialThickness*2]])
+            line_path.append(['v', [-self.boxLength-self.materialThickness*2-self.kerf/2]])
+        else:
+            # $ top row of tabs
+            if masktop and self.kerf ==0.0 and not self.forcing_separation: # don't draw top for packing with no extra cuts
+                line_path.append(['m', [self.boxWidth,0]])
+            else:
+                for i in range(int(self.num_tab_W)):
+                    line_path.append(['h', [self.boxWidth/self.num_tab_W/4-self.kerf/2]])
+                    line_path.append(['v', [-self.materialThickness]])
+                    line_path.append(['h', [self.boxWidth/self.num_tab_W/2+self.kerf]])
+                    line_path.append(['v', [self.materialThickness]])
+                    line_path.append(['h', [self.boxWidth/self.num_tab_W/4-self.kerf/2]])
+            # $ right hand vertical drop
+            for i in range(int(self.num_tab_L)):
+                line_path.append(['v', [self.boxLength/self.num_tab_L/4 - self.kerf/2]])
+                line_path.append(['h', [self.materialThickness]])
+                line_path.append(['v', [self.boxLength/self.num_tab_L/2 + self.kerf]])
+                line_path.append(['h', [-self.materialThickness]])
+                line_path.append(['v', [self.boxLength/self.num_tab_L/4 - self.kerf/2]])
+            # $ bottom row (in reverse)
+            for i in range(int(self.num_tab_W)):
+                line_path.append(['h', [-self.boxWidth/self.num_tab_W/4+self.kerf/2 ]])
+                line_path.append(['v', [self.materialThickness]])
+                line_path.append(['h', [-self.boxWidth/self.num_tab_W/2 -self.kerf]])
+                line_path.append(['v', [-self.materialThickness]])
+                line_path.append(['h', [-self.boxWidth/self.num_tab_W/4+self.kerf/2]])
+            # $ up the left hand side
+            for i in range(int(self.num_tab_L)):
+                line_path.append(['v', [-self.boxLength/self.num_tab_L/4 +self.kerf/2]])
+                line_path.append(['h', [-self.materialThickness]])
+                line_path.append(['v', [-self.boxLength/self.num_tab_L/2 -self.kerf]])
+                line_path.append(['h', [self.materialThickness]])
+                line_path.append(['v', [-self.boxLength/self.num_tab_L/4+self.kerf/2 ]])
+            line_path.append(['v', [-self.kerf/2 ]])
+        return line_path
+
+    def draw_short_side(self, startx, starty, boxCover, boxSide, corners=True):
+        """ Return an SVG path for the short side of box
+        """
+        # Draw side of the box (placed below the lid)
+        line_path = []
+        # $ top row of tabs
+        if corners:
+            line_path.append(['M', [startx - self.materialThickness, starty]])
+            line_path.append(['v', [-self.materialThickness]])
+            line_path.append(['h', [self.materialThickness]])
+        else:
+            line_path.append(['M', [startx, starty]])
+            line_path.append(['v', [-self.materialThickness]])
+        #
+        # if fit perfectly - don't draw double line  modify by Frank SAURET 12-12-2018
+        if boxSide in "Back" and not boxCover:
+            if self.kerf == 0.0 and not self.forcing_separation:
+                if corners:
+                    line_path.append(['m', [self.boxWidth+self.materialThickness,0]])
+                else:
+                    line_path.append(['m', [self.boxWidth,0]])
+            else:
+                if corners:
+                    line_path.append(['h', [self.boxWidth+self.materialThickness]])
+                else:
+                    line_path.append(['h', [self.boxWidth]])
+        else:
+            if self.kerf > 0.0 or self.forcing_separation:
+                for i in range(int(self.num_tab_W)):
+                    line_path.append(['h', [self.boxWidth/self.num_tab_W/4 + self.kerf/2]])
+                    line_path.append(['v', [self.materialThickness]])
+                    line_path.append(['h', [self.boxWidth/self.num_tab_W/2 - self.kerf]])
+                    line_path.append(['v', [-self.materialThickness]])
+                    line_path.append(['h', [self.boxWidth/self.num_tab_W/4 + self.kerf/2 ]])
+                if corners: line_path.append(['h', [self.materialThickness]])
+            else: # move to skipped drawn lines
+                if corners:
+                    line_path.append(['m', [self.boxWidth + self.materialThickness, 0]])
+                else:
+                    line_path.append(['m', [self.boxWidth, 0]])
+        #
+        line_path.append(['v', [self.materialThickness]])
+        if not corners:
+            line_path.append(['h', [self.materialThickness]])
+        # $ Right hand side
+        for i in range(int(self.num_tab_H)):
+            line_path.append(['v', [self.boxHeight/self.num_tab_H/4 + self.kerf/2]])
+            line_path.append(['h', [-self.materialThickness]])
+            line_path.append(['v', [self.boxHeight/self.num_tab_H/2 - self.kerf ]])
+            line_path.append(['h', [self.materialThickness]])
+            line_path.append(['v', [self.boxHeight/self.num_tab_H/4 + self.kerf/2]])
+        #
+        if corners:
+            line_path.append(['v', [self.materialThickness]])
+            line_path.append(['h', [-self.materialThickness]])
+        else:
+            line_path.append(['h', [-self.materialThickness]])
+            line_path.append(['v', [self.materialThickness]])
+        # $ Bottom row of tabs
+        if boxSide in "Front" and not boxCover:
+            if corners:
+                line_path.append(['h', [-self.boxWidth]])
+            else:
+                line_path.append(['h', [-self.boxWidth]])
+        else:
+            for i in range(int(self.num_tab_W)):
+                line_path.append(['h', [-self.boxWidth/self.num_tab_W/4 -self.kerf/2]])
+                line_path.append(['v', [-self.materialThickness]])
+                line_path.append(['h', [-self.boxWidth/self.num_tab_W/2+self.kerf]])
+                line_path.append(['v', [self.materialThickness]])
+                line_path.append(['h', [-self.boxWidth/self.num_tab_W/4-self.kerf/2]])
+        #
+        if corners:
+            line_path.append(['h', [-self.materialThickness]])
+            line_path.append(['v', [-self.materialThickness]])
+        else:
+            line_path.append(['v', [-self.materialThickness]])
+            line_path.append(['h', [-self.materialThickness]])
+        # $ Left hand side
+        for i in range(int(self.num_tab_H)):
+            line_path.append(['v', [-self.boxHeight/self.num_tab_H/4 -self.kerf/2]])
+            line_path.append(['h', [self.materialThickness]])
+            line_path.append(['v', [-self.boxHeight/self.num_tab_H/2+self.kerf]])
+            line_path.append(['h', [-self.materialThickness]])
+            line_path.append(['v', [-self.boxHeight/self.num_tab_H/4-self.kerf/2]])
+        #
+        line_path.append(['h', [self.kerf/2 ]])
+        if not corners:
+            line_path.append(['h', [self.materialThickness]])
+        return line_path
+
+    def draw_long_side(self, startx, starty, boxCover, boxSide, corners):
+        """ Return an SVG path for the long side of box
+        """
+        line_path = []
+        # $ top row of tabs
+        line_path.append(['M', [startx, starty]])
+        line_path.append(['h', [self.materialThickness]])
+        for i in range(int(self.num_tab_H)):
+            line_path.append(['h', [self.boxHeight/self.num_tab_H/4-self.kerf/2]])
+            line_path.append(['v', [-self.materialThickness]])
+            line_path.append(['h', [self.boxHeight/self.num_tab_H/2+self.kerf]])
+            line_path.append(['v', [self.materialThickness]])
+            line_path.append(['h', [self.boxHeight/self.num_tab_H/4 -self.kerf/2]])
+        line_path.append(['h', [self.materialThickness]])
+        # $ Right row of tabs or line
+        if boxSide in "Right" and not boxCover:
+            line_path.append(['v', [self.boxLength]])
+            line_path.append(['h', [-self.materialThickness]])
+        else:
+            for i in range(int(self.num_tab_L)):
+                line_path.append(['v', [self.boxLength/self.num_tab_L/4 + self.kerf/2]])
+                line_path.append(['h', [-self.materialThickness]])
+                line_path.append(['v', [self.boxLength/self.num_tab_L/2 - self.kerf]])
+                line_path.append(['h', [self.materialThickness]])
+                line_path.append(['v', [self.boxLength/self.num_tab_L/4 + self.kerf/2]])
+            line_path.append(['h', [-self.materialThickness]])
+        # $ Bottom row of tab
+        for i in range(int(self.num_tab_H)):
+            line_path.append(['h', [-self.boxHeight/self.num_tab_H/4 -self.kerf/2]])
+            line_path.append(['v', [self.materialThickness]])
+            line_path.append(['h', [-self.boxHeight/self.num_tab_H/2+self.kerf ]])#2>3
+            line_path.append(['v', [-self.materialThickness]])
+            line_path.append(['h', [-self.boxHeight/self.num_tab_H/4-self.kerf/2]])
+        line_path.append(['h', [-self.materialThickness]])
+        # $ Left hand
+        # if fit perfectly - don't draw double line modify by Frank SAURET 12-12-2018
+        if (self.kerf > 0.0 or self.forcing_separation) and (boxCover or boxSide in "Right"):
+            for i in range(int(self.num_tab_L)):
+                line_path.append(['v', [-self.boxLength/self.num_tab_L/4-self.kerf/2]])
+                line_path.append(['h', [self.materialThickness]])
+                line_path.append(['v', [-self.boxLength/self.num_tab_L/2+self.kerf]])
+                line_path.append(['h', [-self.materialThickness]])
+                line_path.append(['v', [-self.boxLength/self.num_tab_L/4-self.kerf/2]])
+            line_path.append(['v', [-self.kerf/2 ]])
+        # si pas de couvercle trace une ligne sans languette
+        elif boxSide in "Left" and not boxCover and (self.kerf > 0.0 or self.forcing_separation):
+            line_path.append(['v', [-self.boxLength-self.kerf/2]])
+
+        return line_path
+
+    def panels_d(self):
+        """ Return the six panels as (id suffix, 'd'), laid out as the original effect() did
+        """
+        separated = self.kerf > 0.0 or self.forcing_separation
+        corners = self.corners
+        cover = self.aveccouvercle
+        t = self.materialThickness
+        panels = []
+        y_pos = 0
+        x_pos = 0
+        panels.append(('lid', self.draw_top_bottom(x_pos, y_pos, cover, 'Top', False)))
+        if separated:
+            y_pos += self.boxLength + 2*t + self.distance_between_side
+        elif cover:
+            y_pos += self.boxLength + t
+        else:
+            y_pos += self.boxLength + t*2
+        panels.append(('longside1', self.draw_short_side(x_pos, y_pos, cover, 'Back', corners=corners)))
+        if separated:
+            y_pos += self.boxHeight + 2*t + self.distance_between_side
+        else:
+            y_pos += self.boxHeight + t
+        panels.append(('base', self.draw_top_bottom(x_pos, y_pos, cover, 'Bot', True)))
+        if separated:
+            y_pos += self.boxLength + 2*t + self.distance_between_side
+        else:
+            y_pos += self.boxLength + t
+        panels.append(('longside2', self.draw_short_side(x_pos, y_pos, cover, 'Front', corners=corners)))
+        if separated:
+            x_pos += self.boxWidth + t + self.distance_between_side
+        elif cover:
+            x_pos += self.boxWidth
+        else:
+            x_pos += self.boxWidth + t
+        y_pos = 0
+        panels.append(('endface2', self.draw_long_side(x_pos, y_pos, cover, 'Left', corners)))
+        if separated:
+            y_pos += self.boxLength + 2*t + self.distance_between_side
+        elif cover:
+            y_pos += self.boxLength + self.boxHeight + 2*t
+        else:
+            y_pos += self.boxLength + self.boxHeight + 3*t
+            x_pos -= t
+        panels.append(('endface1', self.draw_long_side(x_pos, y_pos, cover, 'Right', corners)))
+        return [(suffix, path_to_d(line_path)) for suffix, line_path in panels]
@@ -45,424 +45,363 @@ Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 #  0.1 February 2011 - basic lasercut box with dimples etc
 
 
-# Charger la version depuis Info.json
 import json
 import os
-INFO_PATH = os.path.join(os.path.dirname(__file__), 'Info.json')
-with open(INFO_PATH, encoding='utf-8') as f:
-    __version__ = json.load(f)["version"]
-
-#from math import *
-import sys
+import time
 import inkex
-from simplepath import *
 from lxml import etree
+from boite_brique_geometry import BoxGeometry, DEFAULTS, LINE_ROLES, complete_spec, options_from_spec, style_class, style_to_str
+from boite_brique_profile import Instrumentation, path_counts
+from boite_brique_svg import box_elements
+
+# Attribut du groupe d'une boite qui garde ses paramètres de génération (JSON)
+PARAMETERS_ATTRIBUTE = 'data-boite-brique'
+# Élément <style> des classes de traits partagées par les boites (mode plusieurs boites)
+STYLE_ID = 'boite-brique-styles'
+INFO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Info.json')
+
+def __getattr__(name):
+    """ Read __version__ from Info.json on first use only (not at each run of the extension)
+    """
+    if name == '__version__':
+        with open(INFO_PATH, encoding='utf-8') as f:
+            version = globals()['__version__'] = json.load(f)["version"]
+        return version
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
-class LasercutBox(inkex.Effect):
+class LasercutBox(inkex.Effect, BoxGeometry):
 
     def __init__(self):
         inkex.Effect.__init__(self)
+        # mesures des étapes, si BOITE_BRIQUE_PROFILE est défini (ou avec --profile)
+        self.instrumentation = Instrumentation.from_environment()
         # * Onglet "Dimensions"
         self.arg_parser.add_argument("-C", "--aveccouvercle",
                 type=inkex.Boolean,
-                dest="aveccouvercle", default=True,
+                dest="aveccouvercle", default=DEFAULTS['aveccouvercle'],
                 help="Box is closed or not")
         self.arg_parser.add_argument("-i", "--external_dimensions",
                         type=inkex.Boolean,
-                        dest="external_dimensions", default=False,
+                        dest="external_dimensions", default=DEFAULTS['external_dimensions'],
                         help="Are the Dimensions for External (True) or Internal (False) sizing.")
         self.arg_parser.add_argument("-u", "--units",
                         type=str,
-                        dest="units", default="mm",
+                        dest="units", default=DEFAULTS['units'],
                         help="The unit of the box dimensions")        
         self.arg_parser.add_argument("-x", "--width",
                         type=float,
-                        dest="width", default=30.0,
+                        dest="width", default=DEFAULTS['width'],
                         help="The Box Width - in the X dimension")
         self.arg_parser.add_argument("-y", "--length",
                         type=float,
-                        dest="length", default=60.0,
+                        dest="length", default=DEFAULTS['length'],
                         help="The Box length - in the Y dimension")
         self.arg_parser.add_argument("-z", "--height",
                         type=float,
-                        dest="height", default=30.0,
+                        dest="height", default=DEFAULTS['height'],
                         help="The Box height - in the Z dimension")
         self.arg_parser.add_argument("-t", "--thickness",
                         type=float,
-                        dest="thickness", default=3.0,
+                        dest="thickness", default=DEFAULTS['thickness'],
                         help="Material Thickness")
         self.arg_parser.add_argument("-p", "--num_tab_Width",
                         type=int,
-                        dest="num_tab_Width", default=3,
+                        dest="num_tab_Width", default=DEFAULTS['num_tab_Width'],
                         help="Number of tabs in Width")        
         self.arg_parser.add_argument("-q", "--num_tab_Length",
                         type=int,
-                        dest="num_tab_Length", default=3,
+                        dest="num_tab_Length", default=DEFAULTS['num_tab_Length'],
                         help="Number of tabs in length")        
         self.arg_parser.add_argument("-r", "--num_tab_Height",
                         type=int,
-                        dest="num_tab_Height", default=3,
+                        dest="num_tab_Height", default=DEFAULTS['num_tab_Height'],
                         help="Number of tabs in height")
         self.arg_parser.add_argument("-c", "--corners",
                         type=inkex.Boolean,
-                        dest="corners", default=True,
+                        dest="corners", default=DEFAULTS['corners'],
                         help="The corner cubes can be removed for a different look")
         self.arg_parser.add_argument("-dbs", "--distance_between_side",
                         type=float,
-                        dest="distance_between_side", default=2.0,
+                        dest="distance_between_side", default=DEFAULTS['distance_between_side'],
                         help="Distance between side")        
+        self.arg_parser.add_argument("--update",
+                        type=inkex.Boolean,
+                        dest="update", default=False,
+                        help="Update the selected (or last) box instead of adding a new one")
         # * Onglet "trait de coupe"
         self.arg_parser.add_argument("-b", "--bymaterial",
                         type=inkex.Boolean,
-                        dest="bymaterial", default=True,
+                        dest="bymaterial", default=DEFAULTS['bymaterial'],
                         help="Are kerf define by material")
         self.arg_parser.add_argument("-o", "--materiaux",
-                        type=float,
-                        dest="materiaux", default=0.15,
-                        help="Kerf size define by material")
+                        type=str,
+                        dest="materiaux", default=DEFAULTS['materiaux'],
+                        help="Material id of the catalogue (materiaux.json), gives thickness and kerf")
+        self.arg_parser.add_argument("--machine",
+                        type=str,
+                        dest="machine", default=DEFAULTS['machine'],
+                        help="Machine of the catalogue (the default one if empty)")
         self.arg_parser.add_argument("-k", "--kerf_size",
                         type=float,
-                        dest="kerf_size", default=0.0,
+                        dest="kerf_size", default=DEFAULTS['kerf_size'],
                         help="Kerf size - amount lost to laser for this material. 0 = loose fit")
         self.arg_parser.add_argument("-g", "--linewidth",
                         type=inkex.Boolean,
-                        dest="linewidth", default=True,
+                        dest="linewidth", default=DEFAULTS['linewidth'],
                         help="Use the kerf value as the drawn line width")        
         self.arg_parser.add_argument("-f", "--forcingseparation",
                         type=inkex.Boolean,
-                        dest="forcingseparation", default=False,
+                        dest="forcingseparation", default=DEFAULTS['forcingseparation'],
                         help="Forcing the separation of the panels")
+        # * Onglet "Plusieurs boites"
+        self.arg_parser.add_argument("--specs",
+                        type=str,
+                        dest="specs", default="",
+                        help="CSV or JSON lines file of boxes drawn together (missing fields take the values above)")
+        self.arg_parser.add_argument("--copies",
+                        type=int,
+                        dest="copies", default=1,
+                        help="Number of copies of each box, drawn together")
+        # * Hors de la fenêtre : mesures des étapes
+        self.arg_parser.add_argument("--profile",
+                        type=str,
+                        dest="profile", default="",
+                        help="Write the time, counts and allocations of each stage to this JSON lines file "
+                             "(a cProfile dump for a .prof file, 1 for boite_brique_profile.jsonl next to the output)")
         # * L'onglet séléectionné
         self.arg_parser.add_argument("--tab",
                         type=str, 
                         dest="tab", 
                         default="use",
                         help="The selected UI-tab when OK was pressed")
-        #internal useful variables
-        self.stroke_width  = 0.1 #default for visibility
-        self.external_line_style = {'stroke':          '#660066', # Violet
-                           'fill':            'none',
-                           'stroke-width':    self.stroke_width,
-                           'stroke-linecap':  'butt',
-                           'stroke-linejoin': 'miter'}
-        self.internal_line_style = {'stroke':          '#006633', # Vert foncé
-                           'fill':            'none',
-                           'stroke-width':    self.stroke_width,
-                           'stroke-linecap':  'butt',
-                           'stroke-linejoin': 'miter'}
-    
-    def draw_top_bottom(self, startx, starty, boxCover, boxSide, masktop=False):
-        """ Return an SVG path for the top or bottom of box
-        """
-        line_path = []
-        line_path.append(['M', [startx, starty]])
-        
-        # * Trace le dessus de la boite sans languettes
-        if boxSide in "Top" and not boxCover:
-            line_path.append(['m', [-self.materialThickness, -self.materialThickness]])
-            line_path.append(['h', [self.boxWidth+self.materialThickness*2]])
-            line_path.append(['v', [self.boxLength+self.materialThickness*2]])
-            line_path.append(['h', [-self.boxWidth-self.materialThickness*2]])
-            line_path.append(['v', [-self.boxLength-self.materialThickness*2-self.kerf/2]])
-        else:
-            # $ top row of tabs 
-            if masktop and self.kerf ==0.0 and not self.forcing_separation: # don't draw top for packing with no extra cuts
-                line_path.append(['m', [self.boxWidth,0]])
-            else:
-                for i in range(int(self.num_tab_W)):
-                    line_path.append(['h', [self.boxWidth/self.num_tab_W/4-self.kerf/2]])
-                    line_path.append(['v', [-self.materialThickness]])
-                    line_path.append(['h', [self.boxWidth/self.num_tab_W/2+self.kerf]])
-                    line_path.append(['v', [self.materialThickness]])
-                    line_path.append(['h', [self.boxWidth/self.num_tab_W/4-self.kerf/2]])
-            # $ right hand vertical drop
-            for i in range(int(self.num_tab_L)):
-                line_path.append(['v', [self.boxLength/self.num_tab_L/4 - self.kerf/2]])
-                line_path.append(['h', [self.materialThickness]])
-                line_path.append(['v', [self.boxLength/self.num_tab_L/2 + self.kerf]])
-                line_path.append(['h', [-self.materialThickness]])
-                line_path.append(['v', [self.boxLength/self.num_tab_L/4 - self.kerf/2]])
-            # $ bottom row (in reverse)
-            for i in range(int(self.num_tab_W)):
-                line_path.append(['h', [-self.boxWidth/self.num_tab_W/4+self.kerf/2 ]])
-                line_path.append(['v', [self.materialThickness]])
-                line_path.append(['h', [-self.boxWidth/self.num_tab_W/2 -self.kerf]])
-                line_path.append(['v', [-self.materialThickness]])
-                line_path.append(['h', [-self.boxWidth/self.num_tab_W/4+self.kerf/2]])
-            # $ up the left hand side
-            for i in range(int(self.num_tab_L)):
-                line_path.append(['v', [-self.boxLength/self.num_tab_L/4 +self.kerf/2]])
-                line_path.append(['h', [-self.materialThickness]])
-                line_path.append(['v', [-self.boxLength/self.num_tab_L/2 -self.kerf]])
-                line_path.append(['h', [self.materialThickness]])
-                line_path.append(['v', [-self.boxLength/self.num_tab_L/4+self.kerf/2 ]])
-            line_path.append(['v', [-self.kerf/2 ]])    
-        return line_path
 
-    def draw_short_side(self, startx, starty, boxCover, boxSide, corners=True):
-        """ Return an SVG path for the short side of box
-        """
-        # Draw side of the box (placed below the lid)
-        line_path = []
-        # $ top row of tabs
-        if corners:
-            line_path.append(['M', [startx - self.materialThickness, starty]])
-            line_path.append(['v', [-self.materialThickness]])
-            line_path.append(['h', [self.materialThickness]])
-        else:
-            line_path.append(['M', [startx, starty]])
-            line_path.append(['v', [-self.materialThickness]])
-        #
-        # if fit perfectly - don't draw double line  modify by Frank SAURET 12-12-2018
-        if boxSide in "Back" and not boxCover:
-            if self.kerf == 0.0 and not self.forcing_separation:
-                if corners:
-                    line_path.append(['m', [self.boxWidth+self.materialThickness,0]])
-                else:
-                    line_path.append(['m', [self.boxWidth,0]])
-            else:       
-                if corners:
-                    line_path.append(['h', [self.boxWidth+self.materialThickness]])
-                else:
-                    line_path.append(['h', [self.boxWidth]])
-        else:
-            if self.kerf > 0.0 or self.forcing_separation:
-                for i in range(int(self.num_tab_W)):
-                    line_path.append(['h', [self.boxWidth/self.num_tab_W/4 + self.kerf/2]])
-                    line_path.append(['v', [self.materialThickness]])
-                    line_path.append(['h', [self.boxWidth/self.num_tab_W/2 - self.kerf]])
-                    line_path.append(['v', [-self.materialThickness]])
-                    line_path.append(['h', [self.boxWidth/self.num_tab_W/4 + self.kerf/2 ]])
-                if corners: line_path.append(['h', [self.materialThickness]])
-            else: # move to skipped drawn lines
-                if corners:    
-                    line_path.append(['m', [self.boxWidth + self.materialThickness, 0]])
-                else:
-                    line_path.append(['m', [self.boxWidth, 0]])
-        #
-        line_path.append(['v', [self.materialThickness]])
-        if not corners: 
-            line_path.append(['h', [self.materialThickness]])
-        # $ Right hand side
-        for i in range(int(self.num_tab_H)):
-            line_path.append(['v', [self.boxHeight/self.num_tab_H/4 + self.kerf/2]])
-            line_path.append(['h', [-self.materialThickness]])
-            line_path.append(['v', [self.boxHeight/self.num_tab_H/2 - self.kerf ]])
-            line_path.append(['h', [self.materialThickness]])
-            line_path.append(['v', [self.boxHeight/self.num_tab_H/4 + self.kerf/2]])
-        #
-        if corners:
-            line_path.append(['v', [self.materialThickness]])
-            line_path.append(['h', [-self.materialThickness]])
-        else:
-            line_path.append(['h', [-self.materialThickness]])
-            line_path.append(['v', [self.materialThickness]])
-        # $ Bottom row of tabs
-        if boxSide in "Front" and not boxCover:
-            if corners:
-                line_path.append(['h', [-self.boxWidth]])
-            else:
-                line_path.append(['h', [-self.boxWidth]])
-        else:
-            for i in range(int(self.num_tab_W)):
-                line_path.append(['h', [-self.boxWidth/self.num_tab_W/4 -self.kerf/2]])
-                line_path.append(['v', [-self.materialThickness]])
-                line_path.append(['h', [-self.boxWidth/self.num_tab_W/2+self.kerf]])
-                line_path.append(['v', [self.materialThickness]])
-                line_path.append(['h', [-self.boxWidth/self.num_tab_W/4-self.kerf/2]]) 
-        #
-        if corners:
-            line_path.append(['h', [-self.materialThickness]])
-            line_path.append(['v', [-self.materialThickness]])
-        else:
-            line_path.append(['v', [-self.materialThickness]])
-            line_path.append(['h', [-self.materialThickness]])
-        # $ Left hand side
-        for i in range(int(self.num_tab_H)):
-            line_path.append(['v', [-self.boxHeight/self.num_tab_H/4 -self.kerf/2]])
-            line_path.append(['h', [self.materialThickness]])
-            line_path.append(['v', [-self.boxHeight/self.num_tab_H/2+self.kerf]])
-            line_path.append(['h', [-self.materialThickness]])
-            line_path.append(['v', [-self.boxHeight/self.num_tab_H/4-self.kerf/2]])
-        #
-        line_path.append(['h', [self.kerf/2 ]])
-        if not corners: 
-            line_path.append(['h', [self.materialThickness]])
-        return line_path
+    # * Étapes d'inkex.Effect.run mesurées (lecture des arguments, du document, écriture)
+    def run(self, *args, **kwargs):
+        try:
+            inkex.Effect.run(self, *args, **kwargs)
+        finally: # mesures écrites même si l'effet est interrompu (AbortExtension)
+            self.instrumentation.close()
 
-    def draw_long_side(self, startx, starty, boxCover, boxSide, corners):
-        """ Return an SVG path for the long side of box
-        """
-        line_path = []
-        # $ top row of tabs
-        line_path.append(['M', [startx, starty]])
-        line_path.append(['h', [self.materialThickness]])
-        for i in range(int(self.num_tab_H)):
-            line_path.append(['h', [self.boxHeight/self.num_tab_H/4-self.kerf/2]])
-            line_path.append(['v', [-self.materialThickness]])
-            line_path.append(['h', [self.boxHeight/self.num_tab_H/2+self.kerf]]) 
-            line_path.append(['v', [self.materialThickness]])
-            line_path.append(['h', [self.boxHeight/self.num_tab_H/4 -self.kerf/2]])
-        line_path.append(['h', [self.materialThickness]])
-        # $ Right row of tabs or line
-        if boxSide in "Right" and not boxCover:
-            line_path.append(['v', [self.boxLength]])
-            line_path.append(['h', [-self.materialThickness]])
-        else:
-            for i in range(int(self.num_tab_L)):
-                line_path.append(['v', [self.boxLength/self.num_tab_L/4 + self.kerf/2]])
-                line_path.append(['h', [-self.materialThickness]])
-                line_path.append(['v', [self.boxLength/self.num_tab_L/2 - self.kerf]])
-                line_path.append(['h', [self.materialThickness]])
-                line_path.append(['v', [self.boxLength/self.num_tab_L/4 + self.kerf/2]])
-            line_path.append(['h', [-self.materialThickness]])
-        # $ Bottom row of tab
-        for i in range(int(self.num_tab_H)):
-            line_path.append(['h', [-self.boxHeight/self.num_tab_H/4 -self.kerf/2]])
-            line_path.append(['v', [self.materialThickness]])
-            line_path.append(['h', [-self.boxHeight/self.num_tab_H/2+self.kerf ]])#2>3
-            line_path.append(['v', [-self.materialThickness]])
-            line_path.append(['h', [-self.boxHeight/self.num_tab_H/4-self.kerf/2]])
-        line_path.append(['h', [-self.materialThickness]])
-        # $ Left hand
-        # if fit perfectly - don't draw double line modify by Frank SAURET 12-12-2018
-        if (self.kerf > 0.0 or self.forcing_separation) and (boxCover or boxSide in "Right"):
-            for i in range(int(self.num_tab_L)):
-                line_path.append(['v', [-self.boxLength/self.num_tab_L/4-self.kerf/2]])
-                line_path.append(['h', [self.materialThickness]])
-                line_path.append(['v', [-self.boxLength/self.num_tab_L/2+self.kerf]]) 
-                line_path.append(['h', [-self.materialThickness]])
-                line_path.append(['v', [-self.boxLength/self.num_tab_L/4-self.kerf/2]])
-            line_path.append(['v', [-self.kerf/2 ]])    
-        # si pas de couvercle trace une ligne sans languette
-        elif boxSide in "Left" and not boxCover and (self.kerf > 0.0 or self.forcing_separation):
-            line_path.append(['v', [-self.boxLength-self.kerf/2]])
-                
-        return line_path
+    def parse_arguments(self, args):
+        instrumentation = self.instrumentation
+        if instrumentation.enabled:
+            with instrumentation.stage('parse'):
+                inkex.Effect.parse_arguments(self, args)
+        else: # --profile n'est connu qu'après la lecture des arguments : elle est chronométrée à part
+            start = time.perf_counter()
+            inkex.Effect.parse_arguments(self, args)
+            elapsed = time.perf_counter() - start
+            if self.options.profile:
+                instrumentation.enable(self.options.profile)
+                instrumentation.add('parse', elapsed)
+        output = self.options.output
+        instrumentation.locate(output if isinstance(output, str) else self.options.input_file)
+
+    def load_raw(self):
+        with self.instrumentation.stage('load'):
+            inkex.Effect.load_raw(self)
+
+    def save_raw(self, ret):
+        with self.instrumentation.stage('write'):
+            inkex.Effect.save_raw(self, ret)
 
     # 1- The main function called by the inkscape UI ***************************************************
     def effect(self):
+        if self.options.specs or self.options.copies > 1:
+            self.effect_many()
+            return
+        stage = self.instrumentation.stage
         # 2- extract fields from UI ***************************************************
-        self.boxWidth  = self.options.width
-        self.boxLength  = self.options.length
-        self.boxHeight  = self.options.height
-        self.materialThickness = self.options.thickness
-        self.kerf  = self.options.kerf_size
-        materiaux  = self.options.materiaux
-        bymaterial=self.options.bymaterial
-        if bymaterial: 
-            self.kerf = materiaux
-        self.aveccouvercle=self.options.aveccouvercle
-        self.num_tab_W  = self.options.num_tab_Width
-        self.num_tab_L  = self.options.num_tab_Length
-        self.num_tab_H  = self.options.num_tab_Height
-        self.forcing_separation=self.options.forcingseparation
-        corners  = self.options.corners
-        # 3- Correct for thickness in dimensions
-        if self.options.external_dimensions: # external donc enlève l'épaisseur
-            self.boxWidth -= self.materialThickness*2
-            self.boxLength -= self.materialThickness*2
-            self.boxHeight -= self.materialThickness*2
-        # 3- adjust for laser kerf (precise measurement)
-        self.boxWidth += self.kerf
-        self.boxLength += self.kerf
-        self.boxHeight += self.kerf
+        try:
+            self.set_parameters(self.options)
+        except ValueError as error: # matériau absent du catalogue
+            raise inkex.AbortExtension(str(error))
+        # § Check the parameters before drawing (the full check of the outlines
+        #   is left to the batch mode, --validate)
+        with stage('validate'):
+            try:
+                self.check_parameters()
+            except ValueError as error:
+                raise inkex.AbortExtension(str(error))
         # 3- set the stroke width and line style
-        ls = self.external_line_style
-        if self.kerf == 0.0:
-            ls['stroke-width'] =self.stroke_width
-        else:
-            ls['stroke-width'] = self.kerf    
-        external_line_style = str(inkex.Style(ls))
+        external_line_style = str(inkex.Style(self.line_style()))
+
+        parameters = json.dumps({name: getattr(self.options, name) for name in DEFAULTS}, sort_keys=True)
+        if self.options.update:
+            g = self.find_box()
+            if g is not None:
+                with stage('update'):
+                    self.update_box(g, parameters, external_line_style)
+                return
 
         # 2- create the inkscape object ***************************************************
         box_id = self.svg.get_unique_id('box')
         self.box = g = etree.SubElement(self.svg.get_current_layer(), 'g', {'id':box_id})
+        g.set(PARAMETERS_ATTRIBUTE, parameters)
 
-        # 3- Set local position for drawing the box
-        y_pos = 0
-        x_pos  = 0
-        # §Draw top (using SVG path definitions)
-        line_path = self.draw_top_bottom(x_pos, y_pos, self.aveccouvercle,'Top', False)
-        # 3- Add to scene
-        line_atts = { 'style':external_line_style, 'id':box_id+'-lid', 'd':str(Path(line_path)) }
-        etree.SubElement(g, inkex.addNS('path','svg'), line_atts)
+        # 3- Draw the six panels and add them to scene
+        with stage('paths'):
+            paths = list(box_elements(self, box_id, {'style':external_line_style}))
+        if self.instrumentation.enabled:
+            self.instrumentation.count('paths', **path_counts((path['id'], path['d']) for path in paths))
+        with stage('insert'):
+            for line_atts in paths:
+                etree.SubElement(g, inkex.addNS('path','svg'), line_atts)
 
-        # §draw the short side 1 of the box directly below modify by Frank SAURET 12-12-2018
-        if self.kerf > 0.0 or self.forcing_separation:
-            y_pos += self.boxLength + 2*self.materialThickness+self.options.distance_between_side
-        else:  # kerf = 0 so don't draw extra lines and fit perfectly
-            if self.aveccouvercle:
-                y_pos += self.boxLength + self.materialThickness  # at lower edge of lid
-            else:
-                y_pos += self.boxLength+ self.materialThickness *2   # at lower edge of lid
-        x_pos += 0
-        # 3- Draw side of the box (placed below the top)
-        line_path = self.draw_short_side(x_pos, y_pos, self.aveccouvercle,'Back', corners=corners)
-        # 3- Add to scene
-        line_atts = { 'style':external_line_style, 'id':box_id+'-longside1', 'd':str(Path(line_path)) }
-        etree.SubElement(g, inkex.addNS('path','svg'), line_atts)
+        # § Transform entire drawing to center view (extents known in closed form)
+        with stage('extents'):
+            xmin, ymin, xmax, ymax = self.box_extents()
+        bbox_width = xmax - xmin
+        bbox_height = ymax - ymin
+        translate_x = self.svg.namedview.center[0] - bbox_width / 2
+        translate_y = self.svg.namedview.center[1] - bbox_height / 2
+        g.set('transform', 'translate(%f,%f)' % (translate_x, translate_y))
 
-        # §draw the bottom of the box directly below modify by Frank SAURET 12-12-2018
-        if self.kerf > 0.0 or self.forcing_separation:
-            y_pos += self.boxHeight + 2*self.materialThickness+self.options.distance_between_side
-        else:  # kerf = 0 so don't draw extra lines and fit perfectly
-            y_pos += self.boxHeight + self.materialThickness # at lower edge
-        x_pos += 0
-        line_path = self.draw_top_bottom(x_pos, y_pos, self.aveccouvercle,'Bot', True)
-        # 3- Add to scene
-        line_atts = { 'style':external_line_style, 'id':box_id+'-base', 'd':str(Path(line_path)) }
-        etree.SubElement(g, inkex.addNS('path','svg'), line_atts)
+    def effect_many(self):
+        """ Draw several boxes side by side: the ones of the specs file (or the
+            dialog one), each repeated copies times. The groups are built detached
+            and added to the layer in one operation, the paths use the shared CSS
+            classes of a <style> element instead of inline styles.
+        """
+        stage = self.instrumentation.stage
+        dialog = {name: getattr(self.options, name) for name in DEFAULTS}
+        specs = [dialog]
+        if self.options.specs:
+            with stage('specs'):
+                specs = [complete_spec(dialog, spec) for spec in self.read_specs(self.options.specs)]
+        boxes = []
+        errors = []
+        for index, spec in enumerate(specs, 1):
+            name = spec.get('name') or 'box%d' % index
+            try:
+                options = options_from_spec(spec)
+                geometry = BoxGeometry.from_options(options)
+                with stage('validate'):
+                    geometry.check_parameters()
+            except ValueError as error: # valeur illisible, matériau absent du catalogue ou boite impossible
+                errors.append('%s: %s' % (name, error))
+                continue
+            boxes.extend([(options, geometry)] * max(1, self.options.copies))
+        if errors:
+            raise inkex.AbortExtension('\n'.join(errors))
+        if not boxes:
+            raise inkex.AbortExtension('No box in %s' % self.options.specs)
 
-        # §  draw the second short side 2 of the box directly below modify by Frank SAURET 12-12-2018
-        if self.kerf > 0.0 or self.forcing_separation:
-            y_pos += self.boxLength + 2*self.materialThickness+self.options.distance_between_side
-        else:  # kerf = 0 so don't draw extra lines and fit perfectly
-            y_pos += self.boxLength + self.materialThickness  # at lower edge of lid
-        x_pos += 0
-        # 3- Draw side of the box (placed below the bottom)
-        line_path = self.draw_short_side(x_pos, y_pos, self.aveccouvercle, 'Front', corners=corners)
-        # 3- Add to scene
-        line_atts = { 'style':external_line_style, 'id':box_id+'-longside2', 'd':str(Path(line_path)) }
-        etree.SubElement(g, inkex.addNS('path','svg'), line_atts)
+        used = set()
+        group = etree.Element(inkex.addNS('g','svg'), {'id':self.unique_id('boxes', used)})
+        styles = {}
+        x_pos = 0.0
+        height = 0.0
+        for options, geometry in boxes:
+            style = geometry.line_style()
+            external = style_class('external', style)
+            for role, color in LINE_ROLES:
+                styles[style_class(role, style)] = dict(style, stroke=color)
+            box_id = self.unique_id('box', used)
+            with stage('extents'):
+                xmin, ymin, xmax, ymax = geometry.box_extents()
+            if x_pos:
+                x_pos += geometry.distance_between_side
+            with stage('paths'):
+                paths = list(box_elements(geometry, box_id, {'class':external}))
+            if self.instrumentation.enabled:
+                self.instrumentation.count('paths', **path_counts((path['id'], path['d']) for path in paths))
+            with stage('insert'):
+                g = etree.SubElement(group, inkex.addNS('g','svg'), {'id':box_id})
+                g.set(PARAMETERS_ATTRIBUTE, json.dumps({name: getattr(options, name) for name in DEFAULTS}, sort_keys=True))
+                g.set('transform', 'translate(%f,%f)' % (x_pos - xmin, -ymin))
+                for line_atts in paths:
+                    etree.SubElement(g, inkex.addNS('path','svg'), line_atts)
+            x_pos += xmax - xmin
+            height = max(height, ymax - ymin)
+        self.add_styles(styles)
 
-        # § draw long side 1 next to top by Frank SAURET 12-12-2018
-        if self.kerf > 0.0 or self.forcing_separation:
-            x_pos += self.boxWidth + self.materialThickness + self.options.distance_between_side
-        else:
-            if self.aveccouvercle:
-                x_pos += self.boxWidth  # right at right edge of lid
-            else:
-                x_pos += self.boxWidth + (self.materialThickness)
-        y_pos = 0
-        # 3- Side of the box (placed next to the top)
-        line_path = self.draw_long_side(x_pos, y_pos, self.aveccouvercle,'Left', corners)
-        # 3- Add to scene
-        line_atts = { 'style':external_line_style, 'id':box_id+'-endface2', 'd':str(Path(line_path)) }
-        etree.SubElement(g, inkex.addNS('path','svg'), line_atts)
+        # § Centre all the boxes in the view, then a single insertion in the document
+        translate_x = self.svg.namedview.center[0] - x_pos / 2
+        translate_y = self.svg.namedview.center[1] - height / 2
+        group.set('transform', 'translate(%f,%f)' % (translate_x, translate_y))
+        with stage('insert'):
+            self.svg.get_current_layer().append(group)
+        self.box = group
 
-        # § draw long side 2 next to bottom by Frank SAURET 12-12-2018
-        if self.kerf > 0.0 or self.forcing_separation:
-            y_pos += self.boxLength + 2*self.materialThickness + self.options.distance_between_side
-        else:
-            if self.aveccouvercle:
-                y_pos += self.boxLength +self.boxHeight + 2*self.materialThickness
-            else:
-                y_pos += self.boxLength +self.boxHeight + 3*self.materialThickness
-                x_pos-=self.materialThickness
-        # 3- Side of the box (placed next to the lid)
-        line_path = self.draw_long_side(x_pos, y_pos, self.aveccouvercle,'Right', corners)
-        # 3- Add to scene
-        line_atts = { 'style':external_line_style, 'id':box_id+'-endface1', 'd':str(Path(line_path)) }
-        etree.SubElement(g, inkex.addNS('path','svg'), line_atts)
+    def read_specs(self, filename):
+        """ Return the box specs (dicts) of a CSV or JSON lines file
+        """
+        from boite_brique_batch import read_specs # seulement en mode plusieurs boites
+        fmt = 'csv' if filename.lower().endswith('.csv') else 'jsonl'
+        try:
+            with open(filename, newline='', encoding='utf-8') as f:
+                return list(read_specs(f, fmt))
+        except (OSError, ValueError) as error:
+            raise inkex.AbortExtension('Cannot read %s: %s' % (filename, error))
 
-        # § Transform entire drawing to center view
-        bbox = g.bounding_box()
-        bbox_width = bbox.width
-        bbox_height = bbox.height
-        translate_x = self.svg.namedview.center[0] - bbox_width / 2
-        translate_y = self.svg.namedview.center[1] - bbox_height / 2
-        g.set('transform', 'translate(%f,%f)' % (translate_x, translate_y))
+    def unique_id(self, prefix, used):
+        """ Return an id neither in the document nor in used (ids of the
+            elements not inserted yet), and add it to used
+        """
+        new_id = self.svg.get_unique_id(prefix)
+        while new_id in used:
+            new_id = self.svg.get_unique_id(prefix)
+        used.add(new_id)
+        return new_id
+
+    def add_styles(self, styles):
+        """ Add the {class name: style dict} rules missing from the <style>
+            element of the boxes (created in the defs the first time)
+        """
+        element = self.svg.getElementById(STYLE_ID)
+        if element is None:
+            element = etree.SubElement(self.svg.defs, inkex.addNS('style','svg'), {'id':STYLE_ID, 'type':'text/css'})
+        rules = (element.text or '').split('\n')
+        for name, style in sorted(styles.items()):
+            rule = '.%s{%s}' % (name, style_to_str(style))
+            if rule not in rules:
+                rules.append(rule)
+        element.text = '\n'.join(rule for rule in rules if rule)
+
+    def find_box(self):
+        """ Return the group of the selected box, or of the last box of the document, or None
+        """
+        for element in self.svg.selection.values():
+            while element is not None:
+                if element.get(PARAMETERS_ATTRIBUTE) is not None:
+                    return element
+                element = element.getparent()
+        boxes = self.svg.xpath('//svg:g[@%s]' % PARAMETERS_ATTRIBUTE)
+        return boxes[-1] if boxes else None
+
+    def update_box(self, g, parameters, line_style):
+        """ Rewrite in place the paths of the box group g whose parameters changed,
+            the group keeps its id and position. The paths of the multi-box mode
+            keep their CSS class instead of getting an inline style.
+        """
+        box_id = g.get('id')
+        try:
+            previous = BoxGeometry.from_options(options_from_spec(json.loads(g.get(PARAMETERS_ATTRIBUTE))))
+        except ValueError as error: # paramètres illisibles ou matériau absent du catalogue
+            raise inkex.AbortExtension('Cannot update %s: %s' % (box_id, error))
+        paths = {child.get('id'): child for child in g}
+        style = self.line_style()
+        external = None
+        if any(path.get('class') for path in paths.values()): # boite du mode plusieurs boites
+            external = style_class('external', style)
+            self.add_styles({style_class(role, style): dict(style, stroke=color) for role, color in LINE_ROLES})
+        if previous.line_style() != style:
+            for path in paths.values():
+                if path.get('class'):
+                    others = [name for name in path.get('class').split() if not name.startswith('boite-brique-')]
+                    path.set('class', ' '.join(others + [external]))
+                else:
+                    path.set('style', line_style)
+        for suffix, d in self.changed_panels_d(previous):
+            path = paths.get(box_id + '-' + suffix)
+            if path is None: # panneau supprimé à la main : on le recrée
+                attributes = {'class':external} if external else {'style':line_style}
+                attributes['id'] = box_id+'-'+suffix
+                path = etree.SubElement(g, inkex.addNS('path','svg'), attributes)
+            path.set('d', d)
+        g.set(PARAMETERS_ATTRIBUTE, parameters)
+        self.box = g
 
 ###
 if __name__ == '__main__':
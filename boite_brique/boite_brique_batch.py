@@ -0,0 +1,567 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Génération de boites en lot, sans Inkscape.
+# Lit un flux de descriptions de boites (CSV ou JSON lines) dont les champs
+# sont les options de l'extension (width, length, height, thickness,
+# num_tab_Width...) et écrit un SVG par boite ou un seul SVG regroupant tout.
+# Le SVG regroupant tout est écrit au fil de l'eau, boite par boite : les
+# dimensions du document sont d'abord calculées en forme close (une première
+# lecture des specs, sans tracé), puis chaque groupe est écrit dès qu'il est
+# prêt, la mémoire ne dépend pas du nombre de boites.
+#
+#   python boite_brique_batch.py commandes.csv -o dossier_sortie
+#   python boite_brique_batch.py commandes.jsonl --combined planche.svg
+#   cat commandes.jsonl | python boite_brique_batch.py - --format jsonl -o sortie
+#   python boite_brique_batch.py commandes.jsonl --combined planche.svg -j 0 --report
+#   python boite_brique_batch.py commandes.jsonl --combined planche.svgz
+#   python boite_brique_batch.py commandes.jsonl --combined planches.svg --sheet 600x400 --rotate
+#   python boite_brique_batch.py commandes.jsonl --combined planches.svg --sheet 600x400 --merge --optimize
+#   python boite_brique_batch.py commandes.jsonl --combined planches.gcode --sheet 600x400 --optimize
+#   python boite_brique_batch.py commandes.jsonl -o sortie --validate
+#   python boite_brique_batch.py commandes.jsonl --combined planches.gcode --sheet 600x400 --material pmma-3
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from boite_brique_geometry import BoxGeometry, EXTERNAL_COLOR, INTERNAL_COLOR, complete_spec, options_from_spec, style_to_str, tab_run
+from boite_brique_cutorder import CutPath, chain_segments, travel
+from boite_brique_cutorder import optimize as optimize_cuts
+from boite_brique_export import parse_profile, style_color, writer_for
+from boite_brique_materials import load_catalogue
+from boite_brique_merge import merge_sheet, segments_to_d
+from boite_brique_nesting import Panel, pack, sheet_group
+from boite_brique_svg import SvgWriter, box_elements, box_group, open_output, svg_document
+from boite_brique_validate import ERROR, validate
+
+
+def read_specs(stream, fmt):
+    """ Yield one dict per box read from a CSV or JSON lines stream
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class BoxRender(object):
+    """ The SVG group of one box, its extents (xmin, ymin, xmax, ymax),
+        its panels (for nesting) and the validator warnings
+    """
+    __slots__ = ('name', 'options', 'group', 'extents', 'panels', 'warnings', 'index')
+
+    def __init__(self, name, options, group, extents, panels, warnings=(), index=None):
+        self.name = name
+        self.options = options
+        self.group = group
+        self.extents = extents
+        self.panels = panels
+        self.warnings = warnings
+        self.index = index
+
+
+def render_box(spec, box_id='box', separate=False, check=False):
+    """ Build the SVG group of one box from a spec mapping.
+        Returns a BoxRender, the group has no transform.
+        With separate, each panel is a closed outline (as with forcingseparation)
+        so the panels can be placed independently.
+        With check, the box is validated first: an error raises ValueError,
+        the warnings are kept in the render.
+    """
+    options = options_from_spec(spec)
+    if separate:
+        options.forcingseparation = True
+    geometry = BoxGeometry.from_options(options)
+    geometry.check_parameters()
+    warnings = ()
+    if check:
+        diagnostics = validate(geometry)
+        errors = [str(diagnostic) for diagnostic in diagnostics if diagnostic.level == ERROR]
+        if errors:
+            raise ValueError('; '.join(errors))
+        warnings = [str(diagnostic) for diagnostic in diagnostics]
+    style = style_to_str(geometry.line_style())
+    buffers = geometry.panels()
+    paths = list(box_elements(geometry, box_id, {'style': style}, buffers))
+    panels = []
+    xmin = ymin = float('inf')
+    xmax = ymax = float('-inf')
+    for path, (_, buffer), (suffix, extents) in zip(paths, buffers, geometry.panel_extents()):
+        panels.append(Panel(box_id, suffix, path['d'], buffer, extents, style, geometry.distance_between_side))
+        x0, y0, x1, y1 = extents
+        xmin, ymin = min(xmin, x0), min(ymin, y0)
+        xmax, ymax = max(xmax, x1), max(ymax, y1)
+    return BoxRender(spec.get('name') or box_id, options, box_group(box_id, paths), (xmin, ymin, xmax, ymax), panels, warnings)
+
+
+def translated(render, dx, dy):
+    """ Return the group of a render with a translate transform added
+    """
+    return render.group.replace('<g id=', '<g transform="translate(%r,%r)" id=' % (dx, dy), 1)
+
+
+def write_separate(renders, directory, compress=False):
+    """ Write one SVG file per box (.svgz with compress), return the number of files written
+    """
+    count = 0
+    for render in renders:
+        filename = os.path.join(directory, '%s.%s' % (safe_filename(render.name), 'svgz' if compress else 'svg'))
+        with open_output(filename) as f:
+            f.write(svg_document([render.group], render.extents, render.options.units))
+        count += 1
+    return count
+
+
+def combined_layout(specs):
+    """ Place the boxes side by side as write_combined does, in closed form
+        (no path is built). Returns ({spec index: (dx, dy)}, document extents,
+        units); the specs that cannot give a box are left out.
+    """
+    offsets = {}
+    x_pos = 0.0
+    height = 0.0
+    units = None
+    for index, spec in enumerate(specs, 1):
+        try:
+            options = options_from_spec(spec)
+            geometry = BoxGeometry.from_options(options)
+            geometry.check_parameters()
+        except Exception: # la spec sera signalée au rendu
+            continue
+        xmin, ymin, xmax, ymax = geometry.box_extents()
+        if units is None:
+            units = options.units
+        else:
+            x_pos += geometry.distance_between_side
+        offsets[index] = (x_pos - xmin, -ymin)
+        x_pos += xmax - xmin
+        height = max(height, ymax - ymin)
+    return offsets, (0.0, 0.0, x_pos, height), units or 'mm'
+
+
+def write_combined(renders, stream, layout):
+    """ Stream all the boxes side by side in a single SVG document, each
+        group is written as soon as its box is rendered. layout is the one of
+        combined_layout for the same specs (a box skipped by the validation
+        leaves its place empty). Returns the number of boxes written.
+    """
+    offsets, extents, units = layout
+    writer = SvgWriter(stream)
+    writer.begin(extents, units)
+    for render in renders:
+        offset = offsets.get(render.index)
+        if offset is not None:
+            writer.group(translated(render, *offset))
+    writer.end()
+    return writer.groups
+
+
+def sheet_cuts(sheet, merge=None, optimize=False, info=None):
+    """ Return the polylines of a packed sheet as a list of (style, points),
+        after merging the shared edges (merge is the tolerance) and in cutting
+        order with optimize. The cut length and travel figures go in info.
+    """
+    if info is None:
+        info = {}
+    if merge is not None:
+        merged, info['cut_before'], info['cut_after'] = merge_sheet(sheet, merge)
+        cuts = [CutPath(points, style) for style, segments in merged
+                for points in chain_segments(segments, merge)]
+    else:
+        cuts = [CutPath([placement.to_sheet(x, y) for x, y in points], placement.panel.style)
+                for placement in sheet.placements for points in placement.panel.path.polylines()]
+    if optimize:
+        info['travel_before'], info['lifts_before'] = travel(cuts)
+        cuts = optimize_cuts(cuts)
+        info['travel_after'], info['lifts_after'] = travel(cuts)
+    return cuts
+
+
+def write_sheets(renders, stream, sheet_width, sheet_height, rotate=False, gap=10.0,
+                 merge=None, optimize=False, writer=None):
+    """ Pack the panels of all the boxes on sheets and write them side by side
+        in a single SVG document, one group per sheet, or with the exporter
+        writer (G-code, DXF).
+        With merge (a tolerance), the panels are packed without spacing and the
+        shared edges of each sheet are cut once.
+        With optimize, the paths of each sheet are written in cutting order.
+        Returns a list of (sheet, info) where info holds the cut length and
+        travel figures of the sheet.
+    """
+    panels = []
+    units = None
+    for render in renders:
+        if units is None:
+            units = render.options.units
+        panels.extend(render.panels)
+    # pièces jointives pour la fusion : les bords voisins se superposent
+    sheets = pack(panels, sheet_width, sheet_height, rotate, 0.0 if merge is not None else None)
+    results = []
+    if writer is not None:
+        writer.begin(units or 'mm', sheet_height)
+    else: # la taille du document est connue dès le placement : planches écrites au fil de l'eau
+        svg = SvgWriter(stream)
+        width = len(sheets) * (sheet_width + gap) - gap if sheets else 0.0
+        svg.begin((0.0, 0.0, width, sheet_height), units or 'mm')
+    for index, sheet in enumerate(sheets, 1):
+        info = {}
+        x_offset = (index - 1) * (sheet_width + gap)
+        if writer is not None:
+            for cut in sheet_cuts(sheet, merge, optimize, info):
+                writer.polyline([(x + x_offset, y) for x, y in cut.points], style_color(cut.style))
+        else:
+            paths = None
+            if merge is not None and not optimize:
+                merged, info['cut_before'], info['cut_after'] = merge_sheet(sheet, merge)
+                paths = [(style, segments_to_d(segments)) for style, segments in merged]
+            elif merge is not None or optimize:
+                paths = [(cut.style, cut.to_d()) for cut in sheet_cuts(sheet, merge, optimize, info)]
+            svg.group(sheet_group(sheet, 'sheet%d' % index, x_offset, paths))
+        results.append((sheet, info))
+    if writer is not None:
+        writer.end()
+    else:
+        svg.end()
+    return results
+
+
+def export_combined(renders, writer, layout):
+    """ Stream all the boxes side by side to an exporter (G-code, DXF),
+        one box at a time, placed as write_combined does (layout is the one
+        of combined_layout). Returns the number of boxes written.
+    """
+    offsets, extents, units = layout
+    writer.begin(units, extents[3])
+    count = 0
+    for render in renders:
+        offset = offsets.get(render.index)
+        if offset is None:
+            continue
+        dx, dy = offset
+        for panel in render.panels:
+            colour = style_color(panel.style)
+            for points in panel.path.polylines():
+                writer.polyline([(x + dx, y + dy) for x, y in points], colour)
+        count += 1
+    writer.end()
+    return count
+
+
+def sheet_size(text):
+    """ Parse a sheet size written WIDTHxHEIGHT (e.g. 600x400)
+    """
+    width, height = text.lower().split('x')
+    return float(width), float(height)
+
+
+def safe_filename(name):
+    """ Keep only the characters that are safe in a file name
+    """
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(name))
+
+
+def render_chunk(chunk, separate=False, check=False):
+    """ Render a list of (index, spec) in the current process.
+        An invalid spec gives an error message instead of stopping the chunk.
+        Returns (pid, elapsed seconds, edge cache (hits, misses, maxsize, currsize),
+        [(index, name, render, error)]); the cache figures are a plain tuple so
+        they can be sent back from a worker process.
+    """
+    start = time.perf_counter()
+    results = []
+    for index, spec in chunk:
+        box_id = 'box%d' % index
+        try:
+            render = render_box(spec, box_id, separate, check)
+            render.index = index
+            results.append((index, spec.get('name') or box_id, render, None))
+        except Exception as error: # une spec invalide n'arrête pas le lot
+            results.append((index, spec.get('name') or box_id, None, '%s: %s' % (type(error).__name__, error)))
+    return os.getpid(), time.perf_counter() - start, tuple(tab_run.cache_info()), results
+
+
+def chunked(specs, chunksize):
+    """ Group the specs in lists of (index, spec), indexes start at 1
+    """
+    chunk = []
+    for index, spec in enumerate(specs, 1):
+        chunk.append((index, spec))
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BatchStats(object):
+    """ Throughput of a batch run: boxes, errors and time spent per worker
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.boxes = 0
+        self.errors = []
+        self.warnings = []
+        self.workers = {}
+        self.caches = {}
+
+    def add_chunk(self, pid, elapsed, cache, results):
+        boxes, seconds = self.workers.get(pid, (0, 0.0))
+        self.workers[pid] = (boxes + len(results), seconds + elapsed)
+        if cache is not None: # le cache de chaque processus est cumulatif
+            self.caches[pid] = cache
+        for index, name, render, error in results:
+            if error is None:
+                self.boxes += 1
+                self.warnings.extend((index, name, warning) for warning in render.warnings)
+            else:
+                self.errors.append((index, name, error))
+
+    def report(self):
+        wall = time.perf_counter() - self.start
+        total = self.boxes + len(self.errors)
+        lines = ["%d spec(s) in %.3f s: %.1f specs/s, %d error(s)"
+                 % (total, wall, total / wall if wall > 0 else 0.0, len(self.errors))]
+        for pid, (boxes, seconds) in sorted(self.workers.items()):
+            lines.append("  worker %d: %d spec(s) in %.3f s" % (pid, boxes, seconds))
+            cache = self.caches.get(pid)
+            if cache is not None:
+                hits, misses, maxsize, currsize = cache
+                calls = hits + misses
+                lines.append("    edge cache: %d hit(s), %d miss(es) (%.0f%% hits), %d/%d entries"
+                             % (hits, misses, 100.0 * hits / calls if calls else 0.0, currsize, maxsize))
+        return '\n'.join(lines) + '\n'
+
+
+def iter_renders(specs, jobs=1, chunksize=64, stats=None, separate=False, check=False):
+    """ Render every spec and yield the renders in the order of the specs.
+        With jobs > 1 the chunks are spread over a pool of processes, at most
+        a few chunks per worker are in flight so memory stays bounded.
+        Invalid specs (and with check, the boxes failing validation) are
+        recorded in stats and skipped.
+    """
+    if stats is None:
+        stats = BatchStats()
+    chunks = chunked(specs, chunksize)
+    if jobs == 1:
+        for chunk in chunks:
+            for render in _collect(stats, chunk, *render_chunk(chunk, separate, check)):
+                yield render
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(render_chunk, chunk, separate, check)))
+            if len(pending) >= jobs * 4:
+                for render in _wait_first(stats, pending):
+                    yield render
+        while pending:
+            for render in _wait_first(stats, pending):
+                yield render
+
+
+def _wait_first(stats, pending):
+    chunk, future = pending.popleft()
+    try:
+        pid, elapsed, cache, results = future.result()
+    except Exception as error: # processus perdu : toutes les specs du paquet en erreur
+        pid, elapsed, cache = 0, 0.0, None
+        results = [(index, spec.get('name') or 'box%d' % index, None, '%s: %s' % (type(error).__name__, error))
+                   for index, spec in chunk]
+    return _collect(stats, chunk, pid, elapsed, cache, results)
+
+
+def _collect(stats, chunk, pid, elapsed, cache, results):
+    stats.add_chunk(pid, elapsed, cache, results)
+    return [render for index, name, render, error in results if error is None]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate tabbed boxes without Inkscape")
+    parser.add_argument("specs",
+                        help="CSV or JSON lines file of box specs ('-' for stdin)")
+    parser.add_argument("--format",
+                        choices=('csv', 'jsonl'), default=None,
+                        help="Format of the specs (guessed from the extension by default)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("-o", "--output-dir",
+                        dest="output_dir", default=None,
+                        help="Write one SVG per box in this directory")
+    output.add_argument("--combined",
+                        default=None,
+                        help="Write all boxes in this single SVG ('-' for stdout, gzip compressed for .svgz), "
+                             "or G-code (.gcode, .nc, .ngc) or DXF R12 (.dxf) file")
+    parser.add_argument("--gzip",
+                        action="store_true",
+                        help="Compress the output with gzip (stdout or --combined file, one .svgz file per box with -o)")
+    parser.add_argument("-j", "--jobs",
+                        type=int, default=1,
+                        help="Number of worker processes (0 = one per CPU)")
+    parser.add_argument("--chunksize",
+                        type=int, default=64,
+                        help="Number of specs sent to a worker at once")
+    parser.add_argument("--report",
+                        action="store_true",
+                        help="Print the throughput report (specs/s, time per worker)")
+    parser.add_argument("--sheet",
+                        type=sheet_size, default=None,
+                        help="With --combined, pack the panels on sheets of this size (e.g. 600x400)")
+    parser.add_argument("--rotate",
+                        action="store_true",
+                        help="Allow the panels to be rotated by 90 degrees when packing")
+    parser.add_argument("--merge",
+                        type=float, nargs='?', const=0.01, default=None, metavar="TOLERANCE",
+                        help="With --sheet, cut the shared edges once (collinear overlapping "
+                             "segments closer than TOLERANCE, 0.01 by default)")
+    parser.add_argument("--optimize",
+                        action="store_true",
+                        help="With --sheet, write the paths in an order minimizing the laser travel")
+    parser.add_argument("--rapid-speed",
+                        dest="rapid_speed", type=float, default=200.0,
+                        help="Speed of the laser head between two cuts, in units/s (for the time estimate)")
+    parser.add_argument("--laser-profile",
+                        dest="laser_profiles", type=parse_profile, action="append", default=[],
+                        metavar="COLOUR=FEED:POWER",
+                        help="G-code feed (mm/min) and power for a line colour (e.g. #660066=600:1000), repeatable")
+    parser.add_argument("--validate",
+                        action="store_true",
+                        help="Check each box before writing it (closed outlines, no self-intersection, "
+                             "tabs fitting the slots), boxes with errors are skipped")
+    parser.add_argument("--material",
+                        default=None, metavar="ID",
+                        help="Material of the catalogue for the specs without 'materiaux', 'thickness' or 'kerf_size', "
+                             "its feed and power are used for the G-code")
+    parser.add_argument("--machine",
+                        default=None,
+                        help="Machine of the catalogue for the specs without 'machine'")
+    parser.add_argument("--dxf-polyline",
+                        dest="dxf_polyline", action="store_true",
+                        help="Write DXF POLYLINE entities instead of LINE entities")
+    args = parser.parse_args(argv)
+    if args.sheet and not args.combined:
+        parser.error("--sheet needs --combined")
+    if (args.merge is not None or args.optimize) and not args.sheet:
+        parser.error("--merge and --optimize need --sheet")
+    jobs = args.jobs or os.cpu_count() or 1
+    fmt = args.format
+    if fmt is None:
+        fmt = 'csv' if args.specs.lower().endswith('.csv') else 'jsonl'
+
+    profiles = {}
+    defaults = {}
+    if args.machine:
+        defaults['machine'] = args.machine
+    if args.material:
+        try:
+            material = load_catalogue().material(args.material, args.machine)
+        except ValueError as error:
+            parser.error(str(error))
+        defaults.update(materiaux=material.id, bymaterial=True)
+        profiles[EXTERNAL_COLOR] = profiles[INTERNAL_COLOR] = (material.feed, material.power)
+    profiles.update(args.laser_profiles)
+
+    def open_specs():
+        stream = sys.stdin if args.specs == '-' else open(args.specs, newline='', encoding='utf-8')
+        specs = read_specs(stream, fmt)
+        if defaults:
+            specs = (complete_spec(defaults, spec) for spec in specs)
+        return stream, specs
+
+    stream, specs = open_specs()
+    stats = BatchStats()
+    try:
+        writer = None
+        if args.combined:
+            output = open_output(args.combined, args.gzip)
+            writer = writer_for(args.combined, output, profiles, args.dxf_polyline)
+        layout = None
+        if args.combined and not args.sheet:
+            # 1re lecture : dimensions du document pour écrire l'en-tête avant les boites
+            # (l'origine des exports G-code et DXF est le coin bas gauche)
+            if stream is sys.stdin: # l'entrée standard ne se relit pas : seules les specs sont gardées
+                specs = list(specs)
+                layout = combined_layout(specs)
+            else:
+                first, first_specs = open_specs()
+                try:
+                    layout = combined_layout(first_specs)
+                finally:
+                    first.close()
+        renders = iter_renders(specs, jobs, max(1, args.chunksize), stats,
+                               separate=bool(args.sheet), check=args.validate)
+        if args.sheet:
+            try:
+                renders = list(renders)
+                start = time.perf_counter()
+                sheets = write_sheets(renders, output, args.sheet[0], args.sheet[1], args.rotate,
+                                      merge=args.merge, optimize=args.optimize, writer=writer)
+                elapsed = time.perf_counter() - start
+            finally:
+                output.close()
+            count = len(renders)
+            for index, (sheet, info) in enumerate(sheets, 1):
+                sys.stderr.write("sheet %d: %d panel(s), %.1f%% used"
+                                 % (index, len(sheet.placements), 100.0 * sheet.utilisation))
+                if 'cut_before' in info:
+                    sys.stderr.write(", cut length %.1f -> %.1f" % (info['cut_before'], info['cut_after']))
+                if 'travel_before' in info:
+                    sys.stderr.write(", travel %.1f -> %.1f (%.1f s -> %.1f s), %d -> %d lift(s)"
+                                     % (info['travel_before'], info['travel_after'],
+                                        info['travel_before'] / args.rapid_speed,
+                                        info['travel_after'] / args.rapid_speed,
+                                        info['lifts_before'], info['lifts_after']))
+                sys.stderr.write("\n")
+            if args.report:
+                sys.stderr.write("%d panel(s) packed on %d sheet(s) in %.3f s\n"
+                                 % (sum(len(sheet.placements) for sheet, _ in sheets), len(sheets), elapsed))
+        elif args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            count = write_separate(renders, args.output_dir, args.gzip)
+        else:
+            try:
+                if writer is not None:
+                    count = export_combined(renders, writer, layout)
+                else:
+                    count = write_combined(renders, output, layout)
+            finally:
+                output.close()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    sys.stderr.write("%d box(es) written\n" % count)
+    for index, name, warning in stats.warnings:
+        sys.stderr.write("spec %d (%s): %s\n" % (index, name, warning))
+    for index, name, error in stats.errors:
+        sys.stderr.write("spec %d (%s) skipped: %s\n" % (index, name, error))
+    if args.report:
+        sys.stderr.write(stats.report())
+    return 1 if stats.errors else 0
+
+###
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Ordre de découpe : réduit les déplacements à vide de la tête laser.
+# - les contours intérieurs sont coupés avant les contours qui les entourent,
+# - dans chaque niveau : tournée du plus proche voisin (grille de points
+#   d'entrée) puis amélioration 2-opt sur une fenêtre glissante,
+# - un contour fermé commence au sommet le plus proche de la position de la
+#   tête, un tracé ouvert peut être parcouru dans les deux sens.
+
+from math import hypot, sqrt
+
+# Taille de la fenêtre et nombre de passes de l'amélioration 2-opt
+TWO_OPT_WINDOW = 16
+TWO_OPT_PASSES = 2
+
+
+class CutPath(object):
+    """ A polyline to cut: list of (x, y) points, closed if the last point is the first
+    """
+    __slots__ = ('points', 'closed', 'style')
+
+    def __init__(self, points, style=None, tolerance=1e-6):
+        self.points = points
+        self.style = style
+        x0, y0 = points[0]
+        x1, y1 = points[-1]
+        self.closed = len(points) > 2 and abs(x1 - x0) <= tolerance and abs(y1 - y0) <= tolerance
+
+    @property
+    def entry(self):
+        return self.points[0]
+
+    @property
+    def exit(self):
+        return self.points[-1]
+
+    def bbox(self):
+        xs = [x for x, y in self.points]
+        ys = [y for x, y in self.points]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def start_at(self, index):
+        """ Return the closed path starting (and ending) at the vertex index
+        """
+        points = self.points[:-1]
+        rotated = points[index:] + points[:index]
+        rotated.append(rotated[0])
+        return CutPath(rotated, self.style)
+
+    def reversed(self):
+        return CutPath(self.points[::-1], self.style)
+
+    def to_d(self):
+        """ Serialize as an absolute 'd' string, using H/V for axis-aligned moves
+        """
+        x, y = self.points[0]
+        d = ['M %r %r' % (x, y)]
+        for px, py in self.points[1:]:
+            if py == y:
+                d.append('H %r' % px)
+            elif px == x:
+                d.append('V %r' % py)
+            else:
+                d.append('L %r %r' % (px, py))
+            x, y = px, py
+        return ' '.join(d)
+
+
+def chain_segments(segments, tolerance=1e-6):
+    """ Join segments (x0, y0, x1, y1) sharing an end into polylines.
+        Returns a list of point lists.
+    """
+    def key(x, y):
+        return round(x / tolerance), round(y / tolerance)
+    ends = {}
+    for index, (x0, y0, x1, y1) in enumerate(segments):
+        ends.setdefault(key(x0, y0), []).append(index)
+        ends.setdefault(key(x1, y1), []).append(index)
+    used = [False] * len(segments)
+
+    def follow(points):
+        while True:
+            x, y = points[-1]
+            for index in ends.get(key(x, y), ()):
+                if not used[index]:
+                    break
+            else:
+                return
+            used[index] = True
+            x0, y0, x1, y1 = segments[index]
+            if key(x0, y0) == key(x, y):
+                points.append((x1, y1))
+            else:
+                points.append((x0, y0))
+
+    polylines = []
+    for index, (x0, y0, x1, y1) in enumerate(segments):
+        if used[index]:
+            continue
+        used[index] = True
+        forward = [(x0, y0), (x1, y1)]
+        follow(forward)
+        backward = [(x0, y0)]
+        follow(backward)
+        polylines.append(backward[:0:-1] + forward)
+    return polylines
+
+
+def travel(paths, start=(0.0, 0.0), tolerance=1e-6):
+    """ Return (travel distance, head lifts) to cut the paths in this order
+    """
+    distance = 0.0
+    lifts = 0
+    x, y = start
+    for path in paths:
+        ex, ey = path.entry
+        step = hypot(ex - x, ey - y)
+        if step > tolerance:
+            distance += step
+            lifts += 1
+        x, y = path.exit
+    return distance, lifts
+
+
+def nesting_levels(paths):
+    """ Return the nesting depth of each path: the number of closed paths whose
+        bounding box strictly contains its bounding box
+    """
+    boxes = [path.bbox() for path in paths]
+    closed = [i for i, path in enumerate(paths) if path.closed]
+    if not closed:
+        return [0] * len(paths)
+    sizes = sorted(max(boxes[i][2] - boxes[i][0], boxes[i][3] - boxes[i][1]) for i in closed)
+    cell = sizes[len(sizes) // 2] or 1.0
+    grid = {}
+    for i in closed:
+        x0, y0, x1, y1 = boxes[i]
+        for ix in range(int(x0 // cell), int(x1 // cell) + 1):
+            for iy in range(int(y0 // cell), int(y1 // cell) + 1):
+                grid.setdefault((ix, iy), []).append(i)
+    depth = []
+    for i, (x0, y0, x1, y1) in enumerate(boxes):
+        cx = (x0 + x1) / 2
+        cy = (y0 + y1) / 2
+        level = 0
+        for j in grid.get((int(cx // cell), int(cy // cell)), ()):
+            if j != i:
+                a0, b0, a1, b1 = boxes[j]
+                if a0 < x0 and b0 < y0 and a1 > x1 and b1 > y1:
+                    level += 1
+        depth.append(level)
+    return depth
+
+
+def _nearest_neighbour(paths, start):
+    """ Order the paths by nearest entry point, choosing the start vertex of
+        closed paths and the direction of open ones. Returns (paths, end point).
+    """
+    count = len(paths)
+    entries = []
+    for index, path in enumerate(paths):
+        if path.closed:
+            for vertex, (x, y) in enumerate(path.points[:-1]):
+                entries.append((x, y, index, vertex))
+        else:
+            x, y = path.points[0]
+            entries.append((x, y, index, 0))
+            x, y = path.points[-1]
+            entries.append((x, y, index, -1))
+    xs = [e[0] for e in entries]
+    ys = [e[1] for e in entries]
+    xmin, ymin = min(xs), min(ys)
+    cell = max(max(xs) - xmin, max(ys) - ymin) / max(1.0, sqrt(count)) or 1.0
+    grid = {}
+    for entry in entries:
+        grid.setdefault((int((entry[0] - xmin) // cell), int((entry[1] - ymin) // cell)), []).append(entry)
+    imax = max(ix for ix, iy in grid)
+    jmax = max(iy for ix, iy in grid)
+    used = [False] * count
+    ordered = []
+    x, y = start
+    for _ in range(count):
+        ci = int((x - xmin) // cell)
+        cj = int((y - ymin) // cell)
+        best = None
+        best_dist = float('inf')
+        # premier anneau qui touche la grille : la tête peut en être loin
+        ring = max(0, -ci, ci - imax, -cj, cj - jmax)
+        while True:
+            for key in _ring(ci, cj, ring, imax, jmax):
+                bucket = grid.get(key)
+                if not bucket:
+                    continue
+                alive = [e for e in bucket if not used[e[2]]]
+                if len(alive) != len(bucket):
+                    if alive:
+                        grid[key] = alive
+                    else:
+                        del grid[key]
+                for entry in alive:
+                    dist = hypot(entry[0] - x, entry[1] - y)
+                    if dist < best_dist:
+                        best, best_dist = entry, dist
+            # les cellules de l'anneau suivant sont à au moins ring * cell
+            if best is not None and best_dist <= ring * cell:
+                break
+            if ci - ring < 0 and cj - ring < 0 and ci + ring > imax and cj + ring > jmax:
+                break
+            ring += 1
+        ex, ey, index, vertex = best
+        used[index] = True
+        path = paths[index]
+        if path.closed:
+            path = path.start_at(vertex)
+        elif vertex == -1:
+            path = path.reversed()
+        ordered.append(path)
+        x, y = path.exit
+    return ordered, (x, y)
+
+
+def _ring(ci, cj, ring, imax, jmax):
+    """ Yield the cells of the square ring around (ci, cj) that lie in the
+        grid (0..imax, 0..jmax)
+    """
+    if ring == 0:
+        yield ci, cj
+        return
+    i0, i1 = max(0, ci - ring), min(imax, ci + ring)
+    for j in (cj - ring, cj + ring):
+        if 0 <= j <= jmax:
+            for i in range(i0, i1 + 1):
+                yield i, j
+    j0, j1 = max(0, cj - ring + 1), min(jmax, cj + ring - 1)
+    for i in (ci - ring, ci + ring):
+        if 0 <= i <= imax:
+            for j in range(j0, j1 + 1):
+                yield i, j
+
+
+def _two_opt(paths, start):
+    """ Improve the order by reversing sub-sequences (windowed 2-opt),
+        open paths of a reversed sub-sequence are cut the other way.
+    """
+    n = len(paths)
+    entry = [path.entry for path in paths]
+    exit = [path.exit for path in paths]
+
+    def dist(a, b):
+        return hypot(a[0] - b[0], a[1] - b[1])
+
+    for _ in range(TWO_OPT_PASSES):
+        improved = False
+        for i in range(n - 1):
+            before = exit[i-1] if i > 0 else start
+            for j in range(i + 1, min(n, i + TWO_OPT_WINDOW)):
+                old = dist(before, entry[i])
+                new = dist(before, exit[j])
+                if j + 1 < n:
+                    old += dist(exit[j], entry[j+1])
+                    new += dist(entry[i], entry[j+1])
+                if new < old - 1e-9:
+                    paths[i:j+1] = [path.reversed() if not path.closed else path for path in reversed(paths[i:j+1])]
+                    entry[i:j+1] = [path.entry for path in paths[i:j+1]]
+                    exit[i:j+1] = [path.exit for path in paths[i:j+1]]
+                    improved = True
+        if not improved:
+            break
+    return paths
+
+
+def _best_starts(paths, start):
+    """ Start each closed path at its vertex nearest to the previous exit
+    """
+    x, y = start
+    for index, path in enumerate(paths):
+        if path.closed:
+            points = path.points
+            vertex = min(range(len(points) - 1), key=lambda k: hypot(points[k][0] - x, points[k][1] - y))
+            if vertex:
+                path = paths[index] = path.start_at(vertex)
+        x, y = path.exit
+    return paths
+
+
+def optimize(paths, start=(0.0, 0.0)):
+    """ Return the paths in cutting order: inner paths before the paths around
+        them, then nearest neighbour tour and 2-opt within each level.
+    """
+    if not paths:
+        return []
+    depth = nesting_levels(paths)
+    ordered = []
+    position = start
+    for level in sorted(set(depth), reverse=True):
+        group = [path for path, d in zip(paths, depth) if d == level]
+        tour, end = _nearest_neighbour(group, position)
+        tour = _best_starts(_two_opt(tour, position), position)
+        ordered.extend(tour)
+        position = tour[-1].exit
+    return ordered
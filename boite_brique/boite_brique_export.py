@@ -0,0 +1,169 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Export direct en G-code ou en DXF R12, sans passer par un document SVG.
+# Chaque tracé est écrit dès qu'il est reçu : la mémoire utilisée ne dépend
+# pas de la taille de la planche.
+# Les réglages (vitesse, puissance) dépendent de la couleur du trait :
+# violet #660066 contour externe, vert foncé #006633 contour interne.
+
+from boite_brique_geometry import EXTERNAL_COLOR, INTERNAL_COLOR
+
+# * Réglages par défaut : couleur -> (vitesse d'avance en mm/min, puissance S)
+DEFAULT_PROFILES = {
+    EXTERNAL_COLOR: (600.0, 1000),
+    INTERNAL_COLOR: (800.0, 800),
+}
+
+# * Coordonnées G-code : unités du document converties en mm (G21), le pouce
+#   est écrit tel quel (G20) et les vitesses en mm/min sont alors converties
+MM_PER_UNIT = {'mm': 1.0, 'cm': 10.0, 'px': 25.4/96, 'pt': 25.4/72}
+MM_PER_INCH = 25.4
+
+# $ Le Y du SVG descend : les exporteurs écrivent height - y, l'origine est le
+#   coin bas gauche du document (ou de la planche) et les Y sont positifs
+
+# * Couleurs DXF (index AutoCAD) et noms de calques
+DXF_LAYERS = {
+    EXTERNAL_COLOR: ('EXTERNE', 6), # magenta
+    INTERNAL_COLOR: ('INTERNE', 3), # vert
+}
+
+
+def style_color(style):
+    """ Return the stroke colour of a "key:value;..." style string
+    """
+    for item in style.split(';'):
+        key, _, value = item.partition(':')
+        if key.strip() == 'stroke':
+            return value.strip().lower()
+    return EXTERNAL_COLOR
+
+
+def parse_profile(text):
+    """ Parse a laser profile written COLOUR=FEED:POWER (e.g. #660066=600:1000)
+    """
+    colour, _, setting = text.partition('=')
+    feed, _, power = setting.partition(':')
+    return colour.strip().lower(), (float(feed), int(power))
+
+
+class GcodeWriter(object):
+    """ Write polylines as G-code for a laser (M4 dynamic power, S = power).
+        Points in inches are written in inches (feeds converted from mm/min
+        to in/min), other units are converted to mm.
+    """
+
+    def __init__(self, stream, profiles=None):
+        self.stream = stream
+        self.profiles = dict(DEFAULT_PROFILES)
+        self.profiles.update(profiles or {})
+        self.scale = 1.0
+        self.feed_scale = 1.0
+        self.height = 0.0
+
+    def begin(self, units='mm', height=0.0):
+        """ Write the header, units are those of the points (ValueError if G-code
+            cannot express them) and height the one of the document or sheet
+            (the origin is its bottom left corner)
+        """
+        self.height = height
+        self.feed_scale = 1.0
+        if units == 'in':
+            self.scale = 1.0
+            self.feed_scale = 1.0 / MM_PER_INCH
+        elif units in MM_PER_UNIT:
+            self.scale = MM_PER_UNIT[units]
+        else:
+            raise ValueError("Unit %r cannot be written in G-code (use %s or in)" % (units, ', '.join(MM_PER_UNIT)))
+        write = self.stream.write
+        write('; Boite brique\n')
+        write('G20\n' if units == 'in' else 'G21\n')
+        write('G90\nM5\n')
+
+    def polyline(self, points, colour=EXTERNAL_COLOR):
+        feed, power = self.profiles.get(colour, self.profiles[EXTERNAL_COLOR])
+        write = self.stream.write
+        scale = self.scale
+        height = self.height
+        x, y = points[0]
+        write('G0 X%.4f Y%.4f\n' % (x*scale, (height - y)*scale))
+        write('M4 S%d\n' % power)
+        write('G1 F%.1f\n' % (feed*self.feed_scale))
+        for x, y in points[1:]:
+            write('G1 X%.4f Y%.4f\n' % (x*scale, (height - y)*scale))
+        write('M5\n')
+
+    def end(self):
+        self.stream.write('G0 X0 Y0\nM2\n')
+
+
+class DxfWriter(object):
+    """ Write polylines as a DXF R12 file: LINE entities, or POLYLINE/VERTEX
+        entities with polyline=True (LWPOLYLINE does not exist before R14).
+    """
+
+    def __init__(self, stream, profiles=None, polyline=False):
+        self.stream = stream
+        self.layers = dict(DXF_LAYERS)
+        for colour in (profiles or {}):
+            self.layers.setdefault(colour, ('COUPE_' + colour.lstrip('#').upper(), 7))
+        self.as_polyline = polyline
+        self.height = 0.0
+
+    def _codes(self, *pairs):
+        self.stream.write(''.join('%d\n%s\n' % pair for pair in pairs))
+
+    def begin(self, units='mm', height=0.0):
+        """ Write the header and the layers, height is the one of the document
+            or sheet (the origin is its bottom left corner)
+        """
+        self.height = height
+        self._codes((0, 'SECTION'), (2, 'HEADER'), (9, '$ACADVER'), (1, 'AC1009'), (0, 'ENDSEC'))
+        self._codes((0, 'SECTION'), (2, 'TABLES'), (0, 'TABLE'), (2, 'LAYER'), (70, len(self.layers)))
+        for name, color in self.layers.values():
+            self._codes((0, 'LAYER'), (2, name), (70, 0), (62, color), (6, 'CONTINUOUS'))
+        self._codes((0, 'ENDTAB'), (0, 'ENDSEC'), (0, 'SECTION'), (2, 'ENTITIES'))
+
+    def polyline(self, points, colour=EXTERNAL_COLOR):
+        layer = self.layers.get(colour, self.layers[EXTERNAL_COLOR])[0]
+        height = self.height
+        if self.as_polyline:
+            self._codes((0, 'POLYLINE'), (8, layer), (66, 1), (70, 0))
+            for x, y in points:
+                self._codes((0, 'VERTEX'), (8, layer), (10, '%.6f' % x), (20, '%.6f' % (height - y)))
+            self._codes((0, 'SEQEND'), (8, layer))
+        else:
+            for (x0, y0), (x1, y1) in zip(points, points[1:]):
+                self._codes((0, 'LINE'), (8, layer), (10, '%.6f' % x0), (20, '%.6f' % (height - y0)),
+                            (11, '%.6f' % x1), (21, '%.6f' % (height - y1)))
+
+    def end(self):
+        self._codes((0, 'ENDSEC'), (0, 'EOF'))
+
+
+def writer_for(filename, stream, profiles=None, polyline=False):
+    """ Return the exporter matching the file extension (.gcode/.nc/.ngc or .dxf),
+        or None for other files
+    """
+    extension = filename.lower().rsplit('.', 1)[-1]
+    if extension in ('gcode', 'nc', 'ngc'):
+        return GcodeWriter(stream, profiles)
+    if extension == 'dxf':
+        return DxfWriter(stream, profiles, polyline)
+    return None
@@ -0,0 +1,712 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Géométrie pure de la boite « Brique » : aucun import d'inkex ni de lxml ici.
+# Ce module est utilisé par l'extension Inkscape (boite_brique.py) et par
+# le générateur en lot (boite_brique_batch.py).
+
+from array import array
+from functools import lru_cache
+from types import SimpleNamespace
+
+from boite_brique_materials import material_for
+
+# * Valeurs par défaut des options (mêmes noms que les "dest" de l'arg_parser)
+DEFAULTS = {
+    'aveccouvercle': True,
+    'external_dimensions': False,
+    'units': 'mm',
+    'width': 30.0,
+    'length': 60.0,
+    'height': 30.0,
+    'thickness': 3.0,
+    'num_tab_Width': 3,
+    'num_tab_Length': 3,
+    'num_tab_Height': 3,
+    'corners': True,
+    'distance_between_side': 2.0,
+    'bymaterial': True,
+    'materiaux': 'medium-3', # identifiant du catalogue materiaux.json (ou, avant, le trait de coupe)
+    'machine': '',
+    'kerf_size': 0.0,
+    'linewidth': True,
+    'forcingseparation': False,
+}
+
+# Écriture des nombres dans 'd', comme inkex.paths (number_template "{:.6g}")
+NUMBER = '%.6g'
+
+# Nombre de bords (fragments de 'd' déjà sérialisés) gardés en cache
+EDGE_CACHE_SIZE = 512
+
+# * Paramètres dont dépend le tracé de chaque type de panneau (en plus de sa
+#   position dans la disposition) : la mise à jour ne refait que les
+#   panneaux dont l'un de ces paramètres a changé
+PANEL_PARAMETERS = {
+    'top_bottom': ('boxWidth', 'boxLength', 'materialThickness', 'kerf', 'num_tab_W', 'num_tab_L',
+                   'forcing_separation', 'aveccouvercle'),
+    'short_side': ('boxWidth', 'boxHeight', 'materialThickness', 'kerf', 'num_tab_W', 'num_tab_H',
+                   'forcing_separation', 'aveccouvercle'),
+    'long_side': ('boxLength', 'boxHeight', 'materialThickness', 'kerf', 'num_tab_L', 'num_tab_H',
+                  'forcing_separation', 'aveccouvercle'),
+}
+
+EXTERNAL_COLOR = '#660066' # Violet
+INTERNAL_COLOR = '#006633' # Vert foncé
+ANNOTATION_COLOR = '#ff6600' # Orange, non imprimé
+
+# * Rôle de chaque couleur de trait, nom de sa classe CSS (mode plusieurs boites)
+LINE_ROLES = (('external', EXTERNAL_COLOR), ('internal', INTERNAL_COLOR), ('annotation', ANNOTATION_COLOR))
+
+
+def boolean(value):
+    """ Convert 'True'/'False' strings (as sent by Inkscape) to bool
+    """
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().upper()
+    if text in ('TRUE', '1', 'YES', 'OUI'):
+        return True
+    if text in ('FALSE', '0', 'NO', 'NON', ''):
+        return False
+    raise ValueError("Not a boolean: %r" % (value,))
+
+
+def own_material(spec):
+    """ True if a spec gives its own thickness or kerf but no material: it
+        does not take the thickness and kerf of the default material
+    """
+    def given(key):
+        return spec.get(key) not in (None, '')
+    return (given('thickness') or given('kerf_size')) and not (given('bymaterial') or given('materiaux'))
+
+
+def complete_spec(defaults, spec):
+    """ Return the spec completed with the defaults mapping (dialog values,
+        batch options), without the default material for a spec that has its
+        own thickness or kerf (see own_material)
+    """
+    completed = dict(defaults, **spec)
+    if own_material(spec):
+        completed['bymaterial'] = False
+    return completed
+
+
+def options_from_spec(spec):
+    """ Build an options namespace from a mapping of option names to values.
+        Missing options take their default value, strings are converted
+        to the type of the default (as the arg_parser would do). A spec
+        giving its own thickness or kerf but no material does not use the
+        catalogue.
+    """
+    options = dict(DEFAULTS)
+    if own_material(spec):
+        options['bymaterial'] = False
+    for key, value in spec.items():
+        if key not in DEFAULTS:
+            continue # colonnes supplémentaires (nom, quantité...) ignorées
+        default = DEFAULTS[key]
+        if value is None or value == '':
+            continue
+        if isinstance(default, bool):
+            options[key] = boolean(value)
+        elif isinstance(default, int):
+            options[key] = int(float(value))
+        elif isinstance(default, float):
+            options[key] = float(value)
+        else:
+            options[key] = str(value)
+    return SimpleNamespace(**options)
+
+
+class PathBuffer(object):
+    """ Compact SVG path made of M/m/h/v commands: one byte per command in
+        ops and the numbers in a flat array of doubles (coords).
+        Serialized with to_d(), coordinates() gives the numbers without copy,
+        polylines() and segments() walk the absolute points.
+    """
+    __slots__ = ('ops', 'coords')
+
+    # * Codes des commandes, nombre de valeurs et écriture dans 'd'
+    MOVE_TO, MOVE, SKIP, H, V = range(5)
+    ARITY = (2, 2, 1, 1, 1)
+    FORMATS = tuple(text.replace('%s', NUMBER) for text in ('M %s %s', 'm %s %s', 'm %s 0', 'h %s', 'v %s'))
+
+    def __init__(self):
+        self.ops = array('b')
+        self.coords = array('d')
+
+    def __len__(self):
+        return len(self.ops)
+
+    def move_to(self, x, y):
+        self.ops.append(self.MOVE_TO)
+        self.coords.extend((x, y))
+
+    def move(self, dx, dy):
+        self.ops.append(self.MOVE)
+        self.coords.extend((dx, dy))
+
+    def skip(self, dx):
+        """ Move along the edge without drawing (m dx 0)
+        """
+        self.ops.append(self.SKIP)
+        self.coords.append(dx)
+
+    def h(self, dx):
+        self.ops.append(self.H)
+        self.coords.append(dx)
+
+    def v(self, dy):
+        self.ops.append(self.V)
+        self.coords.append(dy)
+
+    def tabs(self, axis, first, out, middle, count):
+        """ Append count times the five commands of a tab along axis ('h' or 'v'):
+            first, out across the edge, middle, back, first
+        """
+        along, cross = (self.H, self.V) if axis == 'h' else (self.V, self.H)
+        count = int(count)
+        self.ops.extend(array('b', (along, cross, along, cross, along)) * count)
+        self.coords.extend(array('d', (first, out, middle, -out, first)) * count)
+
+    def coordinates(self):
+        """ Return a read-only memoryview of the numbers of the commands
+        """
+        return memoryview(self.coords).toreadonly()
+
+    def to_d(self, precision=None):
+        """ Serialize as an SVG 'd' string. Numbers are written as inkex
+            writes them (6 significant digits, same as PathText) or with a
+            fixed number of decimals.
+        """
+        number = NUMBER if precision is None else '%%.%df' % precision
+        formats = [text.replace(NUMBER, number) for text in self.FORMATS]
+        arity = self.ARITY
+        values = iter(self.coords)
+        d = []
+        for op in self.ops:
+            if arity[op] == 2:
+                d.append(formats[op] % (next(values), next(values)))
+            else:
+                d.append(formats[op] % next(values))
+        return ' '.join(d)
+
+    def polylines(self):
+        """ Yield the drawn polylines as lists of absolute (x, y) points,
+            a new polyline starts at each move
+        """
+        x = y = 0.0
+        points = []
+        values = iter(self.coordinates())
+        for op in self.ops:
+            if op == self.H:
+                x += next(values)
+            elif op == self.V:
+                y += next(values)
+            else:
+                if len(points) > 1:
+                    yield points
+                if op == self.MOVE_TO:
+                    x = next(values)
+                    y = next(values)
+                elif op == self.MOVE:
+                    x += next(values)
+                    y += next(values)
+                else:
+                    x += next(values)
+                points = [(x, y)]
+                continue
+            points.append((x, y))
+        if len(points) > 1:
+            yield points
+
+
+    def segments(self):
+        """ Yield the drawn segments (x0, y0, x1, y1) in absolute coordinates
+            (moves are not drawn)
+        """
+        x = y = 0.0
+        values = iter(self.coordinates())
+        for op in self.ops:
+            if op == self.H:
+                x0 = x
+                x += next(values)
+                yield x0, y, x, y
+            elif op == self.V:
+                y0 = y
+                y += next(values)
+                yield x, y0, x, y
+            elif op == self.MOVE_TO:
+                x = next(values)
+                y = next(values)
+            elif op == self.MOVE:
+                x += next(values)
+                y += next(values)
+            else:
+                x += next(values)
+
+
+def d_extents(d):
+    """ Return (xmin, ymin, xmax, ymax) of a 'd' string made of M/m/h/v commands
+    """
+    x = y = 0.0
+    xmin = ymin = float('inf')
+    xmax = ymax = float('-inf')
+    tokens = d.split()
+    i = 0
+    while i < len(tokens):
+        cmd = tokens[i]
+        if cmd == 'h':
+            x += float(tokens[i+1])
+            i += 2
+        elif cmd == 'v':
+            y += float(tokens[i+1])
+            i += 2
+        elif cmd == 'm':
+            x += float(tokens[i+1])
+            y += float(tokens[i+2])
+            i += 3
+        elif cmd == 'M':
+            x = float(tokens[i+1])
+            y = float(tokens[i+2])
+            i += 3
+        else:
+            raise ValueError("Unsupported path command: %s" % cmd)
+        if x < xmin: xmin = x
+        if x > xmax: xmax = x
+        if y < ymin: ymin = y
+        if y > ymax: ymax = y
+    return xmin, ymin, xmax, ymax
+
+
+def style_to_str(style):
+    """ Serialize a style dict as "key:value;key:value" (like inkex.Style)
+    """
+    return ';'.join('%s:%s' % (key, value) for key, value in style.items())
+
+
+def style_class(role, style):
+    """ Return the CSS class name of a line role for a style: the stroke
+        width is part of the name so boxes with different kerfs never share it
+    """
+    return 'boite-brique-%s-%s' % (role, ('%g' % style['stroke-width']).replace('.', '_'))
+
+
+TAB_FORMAT = ' '.join(['%s ' + NUMBER] * 5)
+
+
+@lru_cache(maxsize=EDGE_CACHE_SIZE, typed=True)
+def tab_run(axis, first, out, middle, count):
+    """ Return the 'd' fragment of count tabs along axis ('h' or 'v'), same
+        commands as PathBuffer.tabs(). Each tab is the same five commands so
+        they are serialized once, and the fragments are kept in a LRU cache:
+        the tab values only depend on the edge length, tab count, kerf,
+        thickness and direction, so boxes sharing them reuse the fragments
+        (see tab_run.cache_info()).
+    """
+    cross = 'v' if axis == 'h' else 'h'
+    tab = TAB_FORMAT % (axis, first, cross, out, axis, middle, cross, -out, axis, first)
+    return ' '.join([tab] * count)
+
+
+class PathText(object):
+    """ Same interface as PathBuffer but writes the 'd' string directly,
+        a run of tabs is the cached tab_run() fragment
+    """
+    __slots__ = ('parts',)
+
+    MOVE_TO, MOVE, SKIP, H, V = PathBuffer.FORMATS
+
+    def __init__(self):
+        self.parts = []
+
+    def __len__(self):
+        return len(self.parts)
+
+    def move_to(self, x, y):
+        self.parts.append(self.MOVE_TO % (x, y))
+
+    def move(self, dx, dy):
+        self.parts.append(self.MOVE % (dx, dy))
+
+    def skip(self, dx):
+        self.parts.append(self.SKIP % dx)
+
+    def h(self, dx):
+        self.parts.append(self.H % dx)
+
+    def v(self, dy):
+        self.parts.append(self.V % dy)
+
+    def tabs(self, axis, first, out, middle, count):
+        count = int(count)
+        if count > 0:
+            self.parts.append(tab_run(axis, first, out, middle, count))
+
+    def to_d(self):
+        return ' '.join(self.parts)
+
+
+class BoxGeometry(object):
+    """ Build the six panels of a tabbed box as SVG paths.
+        Only depends on the standard library so it can be used without Inkscape.
+    """
+    stroke_width = 0.1 # default for visibility
+    path_class = PathBuffer # classe des tracés de draw_* (même interface que PathBuffer)
+
+    @classmethod
+    def from_options(cls, options):
+        """ Return a geometry configured from an options namespace
+        """
+        geometry = cls()
+        geometry.set_parameters(options)
+        return geometry
+
+    def set_parameters(self, options):
+        """ Extract and correct the box parameters from the options
+        """
+        # 2- extract fields from UI
+        self.boxWidth  = float(options.width)
+        self.boxLength  = float(options.length)
+        self.boxHeight  = float(options.height)
+        self.materialThickness = float(options.thickness)
+        self.kerf  = float(options.kerf_size)
+        self.material = None
+        if options.bymaterial: # le matériau donne l'épaisseur et le trait de coupe
+            self.material = material_for(options.materiaux, getattr(options, 'machine', None))
+            if self.material is None: # ancienne valeur : la largeur du trait de coupe
+                self.kerf = float(options.materiaux)
+            else:
+                self.materialThickness = self.material.thickness
+                self.kerf = self.material.kerf
+        self.aveccouvercle = options.aveccouvercle
+        self.num_tab_W  = options.num_tab_Width
+        self.num_tab_L  = options.num_tab_Length
+        self.num_tab_H  = options.num_tab_Height
+        self.forcing_separation = options.forcingseparation
+        self.corners = options.corners
+        self.distance_between_side = float(options.distance_between_side)
+        # 3- Correct for thickness in dimensions
+        if options.external_dimensions: # external donc enlève l'épaisseur
+            self.boxWidth -= self.materialThickness*2
+            self.boxLength -= self.materialThickness*2
+            self.boxHeight -= self.materialThickness*2
+        # 3- adjust for laser kerf (precise measurement)
+        self.boxWidth += self.kerf
+        self.boxLength += self.kerf
+        self.boxHeight += self.kerf
+
+    def check_parameters(self):
+        """ Raise ValueError if the parameters cannot give a valid box
+        """
+        if self.materialThickness < 0.0 or self.kerf < 0.0:
+            raise ValueError("Thickness and kerf must be positive")
+        for name, size, num_tab in (('width', self.boxWidth, self.num_tab_W),
+                                    ('length', self.boxLength, self.num_tab_L),
+                                    ('height', self.boxHeight, self.num_tab_H)):
+            if size <= 0.0:
+                raise ValueError("The %s is too small for the material thickness" % name)
+            if int(num_tab) < 1:
+                raise ValueError("At least one tab is needed in %s" % name)
+            # la fente (largeur/nb/2 - trait de coupe) doit rester positive
+            if self.kerf >= size/num_tab/2:
+                raise ValueError("Too many tabs in %s for this kerf (tabs wider than the panel)" % name)
+
+    def line_style(self, color=EXTERNAL_COLOR):
+        """ Return the line style dict, stroke width is the kerf if there is one
+        """
+        return {'stroke':          color,
+                'fill':            'none',
+                'stroke-width':    self.kerf if self.kerf != 0.0 else self.stroke_width,
+                'stroke-linecap':  'butt',
+                'stroke-linejoin': 'miter'}
+
+    def draw_top_bottom(self, startx, starty, boxCover, boxSide, masktop=False, path=None):
+        """ Return a PathBuffer for the top or bottom of box (or draw into path,
+            e.g. a PathText)
+        """
+        t = self.materialThickness
+        if path is None:
+            path = self.path_class()
+        path.move_to(startx, starty)
+
+        # * Trace le dessus de la boite sans languettes
+        if boxSide in "Top" and not boxCover:
+            path.move(-t, -t)
+            path.h(self.boxWidth+t*2)
+            path.v(self.boxLength+t*2)
+            path.h(-self.boxWidth-t*2)
+            path.v(-self.boxLength-t*2-self.kerf/2)
+        else:
+            # $ top row of tabs
+            if masktop and self.kerf ==0.0 and not self.forcing_separation: # don't draw top for packing with no extra cuts
+                path.skip(self.boxWidth)
+            else:
+                path.tabs('h', self.boxWidth/self.num_tab_W/4-self.kerf/2, -t,
+                          self.boxWidth/self.num_tab_W/2+self.kerf, self.num_tab_W)
+            # $ right hand vertical drop
+            path.tabs('v', self.boxLength/self.num_tab_L/4 - self.kerf/2, t,
+                      self.boxLength/self.num_tab_L/2 + self.kerf, self.num_tab_L)
+            # $ bottom row (in reverse)
+            path.tabs('h', -self.boxWidth/self.num_tab_W/4+self.kerf/2, t,
+                      -self.boxWidth/self.num_tab_W/2 -self.kerf, self.num_tab_W)
+            # $ up the left hand side
+            path.tabs('v', -self.boxLength/self.num_tab_L/4 +self.kerf/2, -t,
+                      -self.boxLength/self.num_tab_L/2 -self.kerf, self.num_tab_L)
+            path.v(-self.kerf/2)
+        return path
+
+    def draw_short_side(self, startx, starty, boxCover, boxSide, corners=True, path=None):
+        """ Return a PathBuffer for the short side of box (or draw into path,
+            e.g. a PathText)
+        """
+        # Draw side of the box (placed below the lid)
+        t = self.materialThickness
+        if path is None:
+            path = self.path_class()
+        # $ top row of tabs
+        if corners:
+            path.move_to(startx - t, starty)
+            path.v(-t)
+            path.h(t)
+        else:
+            path.move_to(startx, starty)
+            path.v(-t)
+        #
+        # if fit perfectly - don't draw double line  modify by Frank SAURET 12-12-2018
+        if boxSide in "Back" and not boxCover:
+            if self.kerf == 0.0 and not self.forcing_separation:
+                path.skip(self.boxWidth+t if corners else self.boxWidth)
+            else:
+                path.h(self.boxWidth+t if corners else self.boxWidth)
+        else:
+            if self.kerf > 0.0 or self.forcing_separation:
+                path.tabs('h', self.boxWidth/self.num_tab_W/4 + self.kerf/2, t,
+                          self.boxWidth/self.num_tab_W/2 - self.kerf, self.num_tab_W)
+                if corners: path.h(t)
+            else: # move to skipped drawn lines
+                path.skip(self.boxWidth + t if corners else self.boxWidth)
+        #
+        path.v(t)
+        if not corners:
+            path.h(t)
+        # $ Right hand side
+        path.tabs('v', self.boxHeight/self.num_tab_H/4 + self.kerf/2, -t,
+                  self.boxHeight/self.num_tab_H/2 - self.kerf, self.num_tab_H)
+        #
+        if corners:
+            path.v(t)
+            path.h(-t)
+        else:
+            path.h(-t)
+            path.v(t)
+        # $ Bottom row of tabs
+        if boxSide in "Front" and not boxCover:
+            path.h(-self.boxWidth)
+        else:
+            path.tabs('h', -self.boxWidth/self.num_tab_W/4 -self.kerf/2, -t,
+                      -self.boxWidth/self.num_tab_W/2+self.kerf, self.num_tab_W)
+        #
+        if corners:
+            path.h(-t)
+            path.v(-t)
+        else:
+            path.v(-t)
+            path.h(-t)
+        # $ Left hand side
+        path.tabs('v', -self.boxHeight/self.num_tab_H/4 -self.kerf/2, t,
+                  -self.boxHeight/self.num_tab_H/2+self.kerf, self.num_tab_H)
+        #
+        path.h(self.kerf/2)
+        if not corners:
+            path.h(t)
+        return path
+
+    def draw_long_side(self, startx, starty, boxCover, boxSide, corners, path=None):
+        """ Return a PathBuffer for the long side of box (or draw into path,
+            e.g. a PathText)
+        """
+        t = self.materialThickness
+        if path is None:
+            path = self.path_class()
+        # $ top row of tabs
+        path.move_to(startx, starty)
+        path.h(t)
+        path.tabs('h', self.boxHeight/self.num_tab_H/4-self.kerf/2, -t,
+                  self.boxHeight/self.num_tab_H/2+self.kerf, self.num_tab_H)
+        path.h(t)
+        # $ Right row of tabs or line
+        if boxSide in "Right" and not boxCover:
+            path.v(self.boxLength)
+            path.h(-t)
+        else:
+            path.tabs('v', self.boxLength/self.num_tab_L/4 + self.kerf/2, -t,
+                      self.boxLength/self.num_tab_L/2 - self.kerf, self.num_tab_L)
+            path.h(-t)
+        # $ Bottom row of tab
+        path.tabs('h', -self.boxHeight/self.num_tab_H/4 -self.kerf/2, t,
+                  -self.boxHeight/self.num_tab_H/2+self.kerf, self.num_tab_H)
+        path.h(-t)
+        # $ Left hand
+        # if fit perfectly - don't draw double line modify by Frank SAURET 12-12-2018
+        if (self.kerf > 0.0 or self.forcing_separation) and (boxCover or boxSide in "Right"):
+            path.tabs('v', -self.boxLength/self.num_tab_L/4-self.kerf/2, t,
+                      -self.boxLength/self.num_tab_L/2+self.kerf, self.num_tab_L)
+            path.v(-self.kerf/2)
+        # si pas de couvercle trace une ligne sans languette
+        elif boxSide in "Left" and not boxCover and (self.kerf > 0.0 or self.forcing_separation):
+            path.v(-self.boxLength-self.kerf/2)
+
+        return path
+
+    def panel_layout(self):
+        """ Return the six panels as a list of (id suffix, kind, startx, starty, boxSide, flag)
+            laid out relative to (0, 0) in the order they are drawn.
+            kind is 'top_bottom', 'short_side' or 'long_side', flag is masktop
+            for top_bottom and corners for the sides.
+        """
+        separated = self.kerf > 0.0 or self.forcing_separation
+        corners = self.corners
+        panels = []
+        # 3- Set local position for drawing the box
+        y_pos = 0.0
+        x_pos  = 0.0
+        # §Draw top (using SVG path definitions)
+        panels.append(('lid', 'top_bottom', x_pos, y_pos, 'Top', False))
+
+        # §draw the short side 1 of the box directly below modify by Frank SAURET 12-12-2018
+        if separated:
+            y_pos += self.boxLength + 2*self.materialThickness+self.distance_between_side
+        else:  # kerf = 0 so don't draw extra lines and fit perfectly
+            if self.aveccouvercle:
+                y_pos += self.boxLength + self.materialThickness  # at lower edge of lid
+            else:
+                y_pos += self.boxLength+ self.materialThickness *2   # at lower edge of lid
+        # 3- Draw side of the box (placed below the top)
+        panels.append(('longside1', 'short_side', x_pos, y_pos, 'Back', corners))
+
+        # §draw the bottom of the box directly below modify by Frank SAURET 12-12-2018
+        if separated:
+            y_pos += self.boxHeight + 2*self.materialThickness+self.distance_between_side
+        else:  # kerf = 0 so don't draw extra lines and fit perfectly
+            y_pos += self.boxHeight + self.materialThickness # at lower edge
+        panels.append(('base', 'top_bottom', x_pos, y_pos, 'Bot', True))
+
+        # §  draw the second short side 2 of the box directly below modify by Frank SAURET 12-12-2018
+        if separated:
+            y_pos += self.boxLength + 2*self.materialThickness+self.distance_between_side
+        else:  # kerf = 0 so don't draw extra lines and fit perfectly
+            y_pos += self.boxLength + self.materialThickness  # at lower edge of lid
+        # 3- Draw side of the box (placed below the bottom)
+        panels.append(('longside2', 'short_side', x_pos, y_pos, 'Front', corners))
+
+        # § draw long side 1 next to top by Frank SAURET 12-12-2018
+        if separated:
+            x_pos += self.boxWidth + self.materialThickness + self.distance_between_side
+        else:
+            if self.aveccouvercle:
+                x_pos += self.boxWidth  # right at right edge of lid
+            else:
+                x_pos += self.boxWidth + (self.materialThickness)
+        y_pos = 0.0
+        # 3- Side of the box (placed next to the top)
+        panels.append(('endface2', 'long_side', x_pos, y_pos, 'Left', corners))
+
+        # § draw long side 2 next to bottom by Frank SAURET 12-12-2018
+        if separated:
+            y_pos += self.boxLength + 2*self.materialThickness + self.distance_between_side
+        else:
+            if self.aveccouvercle:
+                y_pos += self.boxLength +self.boxHeight + 2*self.materialThickness
+            else:
+                y_pos += self.boxLength +self.boxHeight + 3*self.materialThickness
+                x_pos-=self.materialThickness
+        # 3- Side of the box (placed next to the lid)
+        panels.append(('endface1', 'long_side', x_pos, y_pos, 'Right', corners))
+        return panels
+
+    def panels(self):
+        """ Return the six panels as a list of (id suffix, PathBuffer)
+        """
+        return [(suffix, getattr(self, 'draw_' + kind)(x, y, self.aveccouvercle, side, flag))
+                for suffix, kind, x, y, side, flag in self.panel_layout()]
+
+    def panel_extents(self):
+        """ Return [(id suffix, (xmin, ymin, xmax, ymax))] of the six panels in
+            closed form, from the layout and the dimensions (the paths are
+            neither built nor parsed). Same rectangles as d_extents of the paths.
+        """
+        t = self.materialThickness
+        k = self.kerf
+        separated = k > 0.0 or self.forcing_separation
+        extents = []
+        for suffix, kind, x, y, side, flag in self.panel_layout():
+            if kind == 'top_bottom':
+                if side in "Top" and not self.aveccouvercle: # dessus lisse, dépassement de fermeture en haut
+                    top = y - t - k/2
+                elif flag and not separated: # rangée du haut non tracée
+                    top = y
+                else:
+                    top = min(y - t, y - k/2)
+                rect = (x - t, top, x + self.boxWidth + t, y + self.boxLength + t)
+            elif kind == 'short_side':
+                rect = (x - t, y - t, x + self.boxWidth + t, y + self.boxHeight + t)
+            else:
+                rect = (x, min(y - t, y - k/2), x + self.boxHeight + 2*t, y + self.boxLength + t)
+            extents.append((suffix, rect))
+        return extents
+
+    def box_extents(self):
+        """ Return (xmin, ymin, xmax, ymax) of the whole box (see panel_extents)
+        """
+        rects = [rect for suffix, rect in self.panel_extents()]
+        return (min(r[0] for r in rects), min(r[1] for r in rects),
+                max(r[2] for r in rects), max(r[3] for r in rects))
+
+    def panel_signatures(self):
+        """ Return {id suffix: values its path depends on} (see PANEL_PARAMETERS)
+        """
+        return {suffix: (kind, x, y, side, flag) + tuple(getattr(self, name) for name in PANEL_PARAMETERS[kind])
+                for suffix, kind, x, y, side, flag in self.panel_layout()}
+
+    def changed_panels_d(self, previous):
+        """ Return [(id suffix, 'd' string)] of the panels whose path differs
+            from the one drawn by the previous geometry. Only these panels
+            are built.
+        """
+        signatures = previous.panel_signatures()
+        changed = []
+        for suffix, kind, x, y, side, flag in self.panel_layout():
+            signature = (kind, x, y, side, flag) + tuple(getattr(self, name) for name in PANEL_PARAMETERS[kind])
+            if signatures.get(suffix) != signature:
+                changed.append((suffix, self.panel_d(kind, x, y, side, flag)))
+        return changed
+
+    def panel_d(self, kind, x, y, side, flag):
+        """ Return the 'd' string of one panel of the layout, drawn by draw_*
+            into a PathText (runs of tabs come from the tab_run cache)
+        """
+        return getattr(self, 'draw_' + kind)(x, y, self.aveccouvercle, side, flag, PathText()).to_d()
+
+    def panels_d(self):
+        """ Return the six panels as a list of (id suffix, 'd' string),
+            same result as panels() serialized with to_d()
+        """
+        return [(suffix, self.panel_d(kind, x, y, side, flag))
+                for suffix, kind, x, y, side, flag in self.panel_layout()]
@@ -0,0 +1,147 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Catalogue des matériaux (materiaux.json, à côté de ce fichier) :
+# pour chaque matériau son épaisseur et, pour chaque machine, la largeur du
+# trait de coupe, la vitesse d'avance et la puissance.
+# Le fichier n'est lu qu'au premier besoin puis gardé en mémoire, les
+# matériaux sont indexés par identifiant.
+# La liste des matériaux et des machines du fichier .inx est générée ici :
+#
+#   python boite_brique_materials.py --inx boite_brique.inx
+
+import os
+import sys
+from collections import namedtuple
+from functools import lru_cache
+# json (et re qu'il charge) n'est importé qu'à la lecture du catalogue,
+# argparse et xml.sax.saxutils (qui charge urllib et http.client) qu'à la
+# génération du .inx : le simple import de la géométrie reste rapide
+
+CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'materiaux.json')
+
+Material = namedtuple('Material', 'id name thickness kerf feed power machine')
+
+
+class Catalogue(object):
+    """ Materials of the catalogue indexed by id, with their settings per machine
+    """
+    __slots__ = ('machines', 'default_machine', 'materials', 'index')
+
+    def __init__(self, data):
+        self.machines = data.get('machines', {})
+        self.default_machine = data.get('default_machine') or next(iter(self.machines), '')
+        self.materials = data.get('materials', [])
+        self.index = {}
+        for material in self.materials:
+            if material['id'] in self.index:
+                raise ValueError("Material %s is twice in the catalogue" % material['id'])
+            self.index[material['id']] = material
+
+    def material(self, material_id, machine=None):
+        """ Return the Material of an id for a machine (the default one if None or empty).
+            Raises ValueError for an unknown material or a material without
+            settings for the machine.
+        """
+        machine = machine or self.default_machine
+        try:
+            material = self.index[material_id]
+        except KeyError:
+            raise ValueError("Unknown material: %s" % material_id)
+        try:
+            settings = material['settings'][machine]
+        except KeyError:
+            raise ValueError("No settings for %s on the machine %s" % (material_id, machine))
+        return Material(material_id, material.get('name', material_id), float(material['thickness']),
+                        float(settings['kerf']), float(settings.get('feed', 0.0)),
+                        int(settings.get('power', 0)), machine)
+
+
+@lru_cache(maxsize=4)
+def load_catalogue(path=CATALOGUE_PATH):
+    """ Read a catalogue file once and return its Catalogue
+    """
+    import json
+    with open(path, encoding='utf-8') as f:
+        return Catalogue(json.load(f))
+
+
+def material_for(value, machine=None, path=CATALOGUE_PATH):
+    """ Return the Material of a 'materiaux' option value, or None when the
+        value is a number: older documents and presets give the kerf itself.
+    """
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return load_catalogue(path).material(str(value).strip(), machine)
+    return None
+
+
+def inx_options(catalogue):
+    """ Return the <option> lines of the materials and of the machines for the .inx
+    """
+    from xml.sax.saxutils import escape, quoteattr
+    materials = ['<option value=%s>%s</option>' % (quoteattr(m['id']), escape(m.get('name', m['id'])))
+                 for m in catalogue.materials]
+    machines = ['<option value=%s>%s</option>' % (quoteattr(key), escape(value.get('name', key)))
+                for key, value in catalogue.machines.items()]
+    return materials, machines
+
+
+def update_inx(inx, catalogue):
+    """ Return the .inx text with the options of the "materiaux" and "machine"
+        parameters replaced by the ones of the catalogue
+    """
+    import re
+    materials, machines = inx_options(catalogue)
+    for name, options in (('materiaux', materials), ('machine', machines)):
+        pattern = re.compile(r'(<param name="%s"[^>]*>.*?<!--.*?-->\n)(.*?)([ \t]*</param>)' % name, re.S)
+        match = pattern.search(inx)
+        if match is None:
+            raise ValueError('No <param name="%s"> with a comment in the .inx' % name)
+        indent = re.search(r'\n(\s*)<!--', match.group(1)).group(1)
+        body = ''.join(indent + option + '\n' for option in options)
+        inx = inx[:match.start(2)] + body + inx[match.end(2):]
+    return inx
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Material catalogue of the tabbed boxes")
+    parser.add_argument("--catalogue",
+                        default=CATALOGUE_PATH,
+                        help="Catalogue file (materiaux.json next to this script by default)")
+    parser.add_argument("--inx",
+                        default=None,
+                        help="Rewrite the material and machine lists of this .inx file")
+    args = parser.parse_args(argv)
+    catalogue = load_catalogue(args.catalogue)
+    if args.inx:
+        with open(args.inx, encoding='utf-8') as f:
+            inx = f.read()
+        with open(args.inx, 'w', encoding='utf-8') as f:
+            f.write(update_inx(inx, catalogue))
+        return 0
+    for material in catalogue.materials:
+        for machine in material['settings']:
+            sys.stdout.write("%s\n" % (catalogue.material(material['id'], machine),))
+    return 0
+
+###
+if __name__ == '__main__':
+    sys.exit(main())
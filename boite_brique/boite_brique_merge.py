@@ -0,0 +1,120 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Fusion des traits communs : deux segments alignés qui se recouvrent (bords
+# de panneaux voisins) ne doivent être coupés qu'une fois.
+# Les segments horizontaux et verticaux sont rangés dans une table de hachage
+# par ligne (coordonnée constante arrondie à la tolérance), puis les intervalles
+# de chaque ligne sont triés et réunis : le coût reste quasi linéaire.
+
+from math import hypot
+
+
+def cut_length(segments):
+    """ Return the total length of a list of segments (x0, y0, x1, y1)
+    """
+    return sum(hypot(x1 - x0, y1 - y0) for x0, y0, x1, y1 in segments)
+
+
+def merge_segments(segments, tolerance=0.01):
+    """ Return the segments with the collinear overlapping ones merged.
+        Horizontal and vertical segments closer than tolerance are snapped
+        on the same line, other segments are returned unchanged.
+    """
+    horizontal = {}
+    vertical = {}
+    merged = []
+    for x0, y0, x1, y1 in segments:
+        if abs(y1 - y0) <= tolerance:
+            y = (y0 + y1) / 2
+            horizontal.setdefault(round(y / tolerance), []).append((min(x0, x1), max(x0, x1), y))
+        elif abs(x1 - x0) <= tolerance:
+            x = (x0 + x1) / 2
+            vertical.setdefault(round(x / tolerance), []).append((min(y0, y1), max(y0, y1), x))
+        else:
+            merged.append((x0, y0, x1, y1))
+    for low, high, y in _merge_lines(horizontal, tolerance):
+        merged.append((low, y, high, y))
+    for low, high, x in _merge_lines(vertical, tolerance):
+        merged.append((x, low, x, high))
+    return merged
+
+
+def _merge_lines(buckets, tolerance):
+    """ Yield (low, high, position) intervals, one per union of overlapping
+        intervals on a line. Neighbouring buckets are the same line.
+    """
+    keys = sorted(buckets)
+    line = []
+    previous = None
+    for key in keys:
+        if previous is not None and key - previous > 1:
+            for interval in _union(line, tolerance):
+                yield interval
+            line = []
+        line.extend(buckets[key])
+        previous = key
+    for interval in _union(line, tolerance):
+        yield interval
+
+
+def _union(intervals, tolerance):
+    if not intervals:
+        return
+    intervals.sort()
+    low, high, position = intervals[0]
+    for start, end, _ in intervals[1:]:
+        if start <= high + tolerance:
+            if end > high:
+                high = end
+        else:
+            yield low, high, position
+            low, high = start, end
+    yield low, high, position
+
+
+def segments_to_d(segments):
+    """ Serialize segments as an absolute 'd' string (M x y H x / V y / L x y)
+    """
+    d = []
+    for x0, y0, x1, y1 in segments:
+        if y0 == y1:
+            d.append('M %r %r H %r' % (x0, y0, x1))
+        elif x0 == x1:
+            d.append('M %r %r V %r' % (x0, y0, y1))
+        else:
+            d.append('M %r %r L %r %r' % (x0, y0, x1, y1))
+    return ' '.join(d)
+
+
+def merge_sheet(sheet, tolerance=0.01):
+    """ Merge the shared edges of all the panels of a packed sheet.
+        Segments are only merged with segments of the same style.
+        Returns ([(style, segments)], cut length before, cut length after).
+    """
+    by_style = {}
+    for placement in sheet.placements:
+        by_style.setdefault(placement.panel.style, []).extend(placement.segments())
+    paths = []
+    before = after = 0.0
+    for style, segments in by_style.items():
+        merged = merge_segments(segments, tolerance)
+        before += cut_length(segments)
+        after += cut_length(merged)
+        paths.append((style, merged))
+    return paths, before, after
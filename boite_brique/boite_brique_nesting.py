@@ -0,0 +1,227 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Placement des panneaux de plusieurs boites sur des planches de taille fixe.
+# Algorithme « skyline » (ligne d'horizon) bas-gauche, avec rotation de 90°
+# optionnelle. Chaque panneau est traité comme son rectangle englobant
+# agrandi de l'espacement entre pièces (distance_between_side).
+
+from boite_brique_geometry import ANNOTATION_COLOR, style_to_str
+from boite_brique_svg import element, quote
+
+# Nombre de planches (les dernières ouvertes) où l'on cherche encore une place
+OPEN_SHEETS = 3
+
+
+class Panel(object):
+    """ One panel to place: its 'd' string, its path (PathBuffer, read by the
+        merge and the exporters), extents and the spacing around it
+    """
+    __slots__ = ('box_id', 'suffix', 'd', 'path', 'extents', 'style', 'spacing')
+
+    def __init__(self, box_id, suffix, d, path, extents, style, spacing):
+        self.box_id = box_id
+        self.suffix = suffix
+        self.d = d
+        self.path = path
+        self.extents = extents
+        self.style = style
+        self.spacing = spacing
+
+    @property
+    def width(self):
+        return self.extents[2] - self.extents[0]
+
+    @property
+    def height(self):
+        return self.extents[3] - self.extents[1]
+
+
+class Placement(object):
+    """ A panel placed on a sheet, (x, y) is the top left corner of its rectangle
+    """
+    __slots__ = ('panel', 'x', 'y', 'rotated')
+
+    def __init__(self, panel, x, y, rotated):
+        self.panel = panel
+        self.x = x
+        self.y = y
+        self.rotated = rotated
+
+    def transform(self):
+        """ Return the SVG transform moving the panel to its place
+        """
+        xmin, ymin, xmax, ymax = self.panel.extents
+        if self.rotated: # rotate(90) : (x, y) -> (-y, x)
+            return 'translate(%r,%r) rotate(90)' % (self.x + ymax, self.y - xmin)
+        return 'translate(%r,%r)' % (self.x - xmin, self.y - ymin)
+
+    def to_sheet(self, x, y):
+        """ Return the sheet coordinates of a point of the panel
+        """
+        xmin, ymin, xmax, ymax = self.panel.extents
+        if self.rotated:
+            return self.x + ymax - y, self.y - xmin + x
+        return self.x - xmin + x, self.y - ymin + y
+
+    def segments(self):
+        """ Yield the drawn segments of the panel in sheet coordinates
+        """
+        to_sheet = self.to_sheet
+        for x0, y0, x1, y1 in self.panel.path.segments():
+            yield to_sheet(x0, y0) + to_sheet(x1, y1)
+
+
+class Sheet(object):
+    """ A sheet of material and its skyline (list of [x, y, width] from left to right,
+        the last segment goes to infinity, the right edge is checked separately)
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.placements = []
+        self.used_area = 0.0
+        self.skyline = [[0.0, 0.0, float('inf')]]
+
+    @property
+    def utilisation(self):
+        """ Part of the sheet covered by the panel rectangles (0 to 1)
+        """
+        return self.used_area / (self.width * self.height)
+
+    def find_position(self, width, height, margin):
+        """ Return (top, x, index) of the position where the bottom of the
+            rectangle is the highest on the sheet (lowest y), or None
+        """
+        best = None
+        skyline = self.skyline
+        for i, (x, y, w) in enumerate(skyline):
+            if x + width > self.width + margin:
+                break
+            top = y
+            covered = w
+            j = i + 1
+            while covered < width:
+                top = max(top, skyline[j][1])
+                covered += skyline[j][2]
+                j += 1
+            if top + height > self.height + margin:
+                continue
+            if best is None or (top, x) < best[:2]:
+                best = (top, x, i) # même hauteur de rectangle : comparer le haut suffit
+        return best
+
+    def place(self, index, x, y, width, height):
+        """ Raise the skyline where a rectangle was put at (x, y)
+        """
+        skyline = self.skyline
+        end = x + width
+        new = [x, y + height, width]
+        i = index
+        # retire ou raccourcit les segments recouverts
+        while i < len(skyline) and skyline[i][0] < end:
+            sx, sy, sw = skyline[i]
+            if sx + sw <= end:
+                del skyline[i]
+            else:
+                skyline[i] = [end, sy, sx + sw - end]
+                break
+        skyline.insert(index, new)
+        # fusionne les segments voisins de même hauteur
+        merged = [skyline[0]]
+        for segment in skyline[1:]:
+            last = merged[-1]
+            if segment[1] == last[1]:
+                last[2] = segment[0] + segment[2] - last[0]
+            else:
+                merged.append(segment)
+        self.skyline = merged
+
+
+def pack(panels, sheet_width, sheet_height, rotate=False, spacing=None):
+    """ Pack the panels on as many sheets as needed and return the list of Sheet.
+        Each panel is reserved its rectangle plus its spacing on the right and
+        bottom, the sheets are enlarged by the same spacing so the last row
+        and column can touch the sheet edge. spacing, if given, replaces the
+        spacing of every panel (0 makes the neighbouring edges touch so they
+        can be merged).
+        Only the last OPEN_SHEETS sheets are tried before opening a new one:
+        the panels come largest first so older sheets rarely have room left.
+        Raises ValueError if a panel is larger than a sheet.
+    """
+    def size(panel):
+        return max(panel.width, panel.height), panel.width * panel.height
+    sheets = []
+    for panel in sorted(panels, key=size, reverse=True):
+        margin = panel.spacing if spacing is None else spacing
+        orientations = [(panel.width, panel.height, False)]
+        if rotate and panel.width != panel.height:
+            orientations.append((panel.height, panel.width, True))
+        area = panel.width * panel.height
+        for sheet in sheets[-OPEN_SHEETS:]:
+            if sheet.width * sheet.height - sheet.used_area < area:
+                continue
+            if _place_on(sheet, panel, orientations, margin):
+                break
+        else:
+            sheet = Sheet(sheet_width, sheet_height)
+            if not _place_on(sheet, panel, orientations, margin):
+                raise ValueError("Panel %s-%s (%.1f x %.1f) is larger than the sheet"
+                                 % (panel.box_id, panel.suffix, panel.width, panel.height))
+            sheets.append(sheet)
+    return sheets
+
+
+def _place_on(sheet, panel, orientations, margin):
+    best = None
+    for width, height, rotated in orientations:
+        position = sheet.find_position(width + margin, height + margin, margin)
+        if position is None:
+            continue
+        key = (position[0] + height, position[1])
+        if best is None or key < best[0]:
+            best = (key, position, width, height, rotated)
+    if best is None:
+        return False
+    key, (top, x, index), width, height, rotated = best
+    sheet.place(index, x, top, width + margin, height + margin)
+    sheet.placements.append(Placement(panel, x, top, rotated))
+    sheet.used_area += width * height
+    return True
+
+
+def sheet_group(sheet, sheet_id, x_offset=0.0, paths=None):
+    """ Return the SVG group of a sheet: its outline (annotation) and its panels.
+        paths, if given, is a list of (style, absolute 'd') written instead of
+        the panels (e.g. after merging the shared edges).
+    """
+    outline = style_to_str({'stroke': ANNOTATION_COLOR, 'fill': 'none', 'stroke-width': 0.1})
+    lines = ['<g id=%s transform=%s>' % (quote(sheet_id), quote('translate(%r,0.0)' % x_offset)),
+             element('rect', {'id': sheet_id + '-outline', 'style': outline, 'x': 0, 'y': 0,
+                              'width': sheet.width, 'height': sheet.height})]
+    if paths is None:
+        for placement in sheet.placements:
+            panel = placement.panel
+            lines.append(element('path', {'style': panel.style, 'id': panel.box_id + '-' + panel.suffix,
+                                          'transform': placement.transform(), 'd': panel.d}))
+    else:
+        for index, (style, d) in enumerate(paths, 1):
+            lines.append(element('path', {'style': style, 'id': '%s-cut%d' % (sheet_id, index), 'd': d}))
+    lines.append('</g>\n')
+    return '\n'.join(lines)
@@ -0,0 +1,230 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Mesures des étapes d'une génération (lecture des arguments, tracés, insertion
+# dans le document, écriture...) : durée, compteurs (segments, panneaux...) et
+# mémoire allouée (tracemalloc). Rien n'est mesuré tant que ce n'est pas activé
+# par la variable d'environnement BOITE_BRIQUE_PROFILE ou l'option --profile,
+# dont la valeur est le fichier de sortie :
+# - un fichier .prof reçoit un profil cProfile de toute l'exécution,
+# - sinon chaque étape ajoute une ligne JSON au fichier (JSON lines),
+# - 1 (ou true, yes) écrit boite_brique_profile.jsonl à côté du document produit.
+#
+#   BOITE_BRIQUE_PROFILE=mesures.jsonl python boite_brique.py boite.svg > sortie.svg
+#   python boite_brique_profile.py mesures.jsonl       # résumé par étape
+
+import json
+import os
+import sys
+import time
+
+ENVIRONMENT_VARIABLE = 'BOITE_BRIQUE_PROFILE'
+DEFAULT_FILENAME = 'boite_brique_profile.jsonl'
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+class NullStage(object):
+    """ Context manager doing nothing (instrumentation disabled)
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage(object):
+    """ Context manager adding the wall time and the allocations of a block
+        to the record of a stage (a stage can be entered several times)
+    """
+    __slots__ = ('record', 'start', 'memory')
+
+    def __init__(self, record):
+        self.record = record
+
+    def __enter__(self):
+        import tracemalloc
+        if hasattr(tracemalloc, 'reset_peak'): # Python 3.9 et plus
+            tracemalloc.reset_peak()
+        self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        import tracemalloc
+        elapsed = time.perf_counter() - self.start
+        current, peak = tracemalloc.get_traced_memory()
+        record = self.record
+        record['seconds'] += elapsed
+        record['calls'] += 1
+        record['allocated'] += current - self.memory
+        record['peak'] = max(record['peak'], peak - self.memory)
+        return False
+
+
+class Instrumentation(object):
+    """ Per-stage measures of one run, written as JSON lines (or a cProfile
+        dump for a .prof file) by close(). Does nothing until enabled.
+    """
+    __slots__ = ('path', 'records', 'profiler', 'started')
+
+    def __init__(self):
+        self.path = None
+        self.records = {}
+        self.profiler = None
+        self.started = time.time()
+
+    @classmethod
+    def from_environment(cls):
+        """ Return an instrumentation enabled if the environment variable is set
+        """
+        instrumentation = cls()
+        value = os.environ.get(ENVIRONMENT_VARIABLE)
+        if value:
+            instrumentation.enable(value)
+        return instrumentation
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def enable(self, value):
+        """ Start measuring. value is the output file, or 1 for the default
+            file (see locate)
+        """
+        if self.enabled:
+            return
+        if value.lower() in TRUE_VALUES:
+            value = DEFAULT_FILENAME
+        self.path = value
+        if value.endswith('.prof'):
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def locate(self, near):
+        """ Put the default file in the directory of near (a file name)
+        """
+        if self.path == DEFAULT_FILENAME and near:
+            self.path = os.path.join(os.path.dirname(os.path.abspath(near)), DEFAULT_FILENAME)
+
+    def stage(self, name):
+        """ Return a context manager measuring a block as the stage name
+        """
+        if self.path is None or self.profiler is not None:
+            return NULL_STAGE
+        return Stage(self._record(name))
+
+    def add(self, name, seconds):
+        """ Add to the stage name a block timed before measuring was enabled
+            (no allocation figures)
+        """
+        if self.path is None or self.profiler is not None:
+            return
+        record = self._record(name)
+        record['seconds'] += seconds
+        record['calls'] += 1
+
+    def _record(self, name):
+        record = self.records.get(name)
+        if record is None:
+            record = self.records[name] = {'stage': name, 'seconds': 0.0, 'calls': 0, 'allocated': 0, 'peak': 0}
+        return record
+
+    def count(self, name, **counts):
+        """ Add counts (segments, panels...) to the record of a stage
+        """
+        record = self.records.get(name)
+        if record is not None:
+            for key, value in counts.items():
+                record[key] = record.get(key, 0) + value
+
+    def close(self):
+        """ Write the measures and stop measuring
+        """
+        if self.path is None:
+            return
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.path)
+        else:
+            import tracemalloc
+            tracemalloc.stop()
+            run = {'pid': os.getpid(), 'time': self.started}
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for record in self.records.values():
+                    f.write(json.dumps(dict(run, **record), sort_keys=True) + '\n')
+                total = sum(record['seconds'] for record in self.records.values())
+                f.write(json.dumps(dict(run, stage='total', seconds=total), sort_keys=True) + '\n')
+        self.path = None
+
+
+def path_counts(panels):
+    """ Return the counts of [(id suffix, 'd')] made of M/m/h/v commands:
+        panels, segments (h and v) and moves (M and m)
+    """
+    counts = {'panels': 0, 'segments': 0, 'moves': 0}
+    for suffix, d in panels:
+        counts['panels'] += 1
+        counts['segments'] += d.count('h') + d.count('v')
+        counts['moves'] += d.count('m') + d.count('M')
+    return counts
+
+
+def summary(stream):
+    """ Return {stage: (runs, mean seconds, max seconds, mean peak bytes)} of JSON lines
+    """
+    stages = {}
+    for line in stream:
+        line = line.strip()
+        if line:
+            record = json.loads(line)
+            stages.setdefault(record['stage'], []).append(record)
+    result = {}
+    for name, records in stages.items():
+        seconds = [record['seconds'] for record in records]
+        peaks = [record.get('peak', 0) for record in records]
+        result[name] = (len(records), sum(seconds) / len(seconds), max(seconds), sum(peaks) / len(peaks))
+    return result
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Summary of the stage measures of the box generation")
+    parser.add_argument("measures",
+                        help="JSON lines file written with %s or --profile" % ENVIRONMENT_VARIABLE)
+    args = parser.parse_args(argv)
+    with open(args.measures, encoding='utf-8') as f:
+        stages = summary(f)
+    sys.stdout.write("%-10s %6s %12s %12s %12s\n" % ("stage", "runs", "mean (ms)", "max (ms)", "peak KiB"))
+    for name, (runs, mean, worst, peak) in sorted(stages.items(), key=lambda item: -item[1][1]):
+        sys.stdout.write("%-10s %6d %12.3f %12.3f %12.1f\n" % (name, runs, mean * 1000.0, worst * 1000.0, peak / 1024.0))
+    return 0
+
+###
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Éléments SVG des boites, communs à l'extension et au générateur en lot :
+# box_elements donne les attributs des chemins d'une boite, que l'extension
+# ajoute à l'arbre lxml et que le lot écrit directement en texte.
+# SvgWriter écrit un document au fil de l'eau, groupe par groupe : en-tête
+# fixe (les dimensions du document doivent être connues avant), un groupe par
+# boite ou par planche, puis la fin du document ; rien n'est gardé en mémoire.
+# open_output ouvre la sortie (fichier ou sortie standard), compressée en gzip
+# pour un fichier .svgz.
+# Pas d'import d'inkex ni de lxml ici.
+
+import sys
+
+SVG_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
+              'width="%s%s" height="%s%s" viewBox="%s %s %s %s">\n')
+SVG_FOOTER = '</svg>\n'
+
+
+def quote(value):
+    """ Return a string as a double-quoted XML attribute value
+    """
+    value = str(value)
+    if any(c in value for c in '&<>"'):
+        value = value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+    return '"%s"' % value
+
+
+def box_elements(geometry, box_id, attributes, panels=None):
+    """ Yield the attribute dicts of the six paths of a box: attributes
+        (style or class) followed by the id and the 'd' of each panel.
+        panels, if given, are the PathBuffer of geometry.panels() to serialize
+        instead of drawing the panels again.
+    """
+    if panels is None:
+        panels_d = geometry.panels_d()
+    else:
+        panels_d = [(suffix, path.to_d()) for suffix, path in panels]
+    for suffix, d in panels_d:
+        path = dict(attributes)
+        path['id'] = box_id + '-' + suffix
+        path['d'] = d
+        yield path
+
+
+def element(tag, attributes):
+    """ Return an empty element as text
+    """
+    return '<%s %s/>' % (tag, ' '.join('%s=%s' % (name, quote(value)) for name, value in attributes.items()))
+
+
+def box_group(box_id, paths):
+    """ Return the group of a box as text, paths are attribute dicts
+        (see box_elements)
+    """
+    lines = ['<g id=%s>' % quote(box_id)]
+    lines.extend(element('path', path) for path in paths)
+    lines.append('</g>\n')
+    return '\n'.join(lines)
+
+
+def svg_document(groups, extents, units):
+    """ Return a complete SVG document around already serialized groups
+    """
+    xmin, ymin, xmax, ymax = extents
+    width = xmax - xmin
+    height = ymax - ymin
+    return (SVG_HEADER % (width, units, height, units, xmin, ymin, width, height)
+            + ''.join(groups) + SVG_FOOTER)
+
+
+class SvgWriter(object):
+    """ Write an SVG document to a text stream one group at a time
+    """
+    __slots__ = ('stream', 'groups')
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.groups = 0
+
+    def begin(self, extents, units):
+        """ Write the header, extents (xmin, ymin, xmax, ymax) are those of the whole document
+        """
+        xmin, ymin, xmax, ymax = extents
+        width = xmax - xmin
+        height = ymax - ymin
+        self.stream.write(SVG_HEADER % (width, units, height, units, xmin, ymin, width, height))
+
+    def group(self, text):
+        """ Write an already serialized group
+        """
+        self.stream.write(text)
+        self.groups += 1
+
+    def end(self):
+        self.stream.write(SVG_FOOTER)
+
+
+def open_output(filename, compress=False):
+    """ Return a text stream writing to filename ('-' for stdout), gzip
+        compressed for a .svgz file or with compress. Closing it never
+        closes stdout.
+    """
+    compress = compress or filename.lower().endswith('.svgz')
+    if filename == '-':
+        sys.stdout.flush()
+        if not compress: # même descripteur que stdout, qui reste ouvert
+            return open(sys.stdout.fileno(), 'w', encoding='utf-8', closefd=False)
+        import gzip
+        import io
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'), encoding='utf-8')
+    if not compress:
+        return open(filename, 'w', encoding='utf-8')
+    import gzip
+    return gzip.open(filename, 'wt', encoding='utf-8')
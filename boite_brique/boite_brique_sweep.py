@@ -0,0 +1,336 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Exploration des variantes d'une boite pour un devis : pour des dimensions
+# données, toutes les combinaisons de nombres de languettes, d'épaisseurs (ou
+# de matériaux), de dimensions intérieures/extérieures, avec ou sans couvercle
+# et coins sont évaluées puis classées par surface de matière, longueur de
+# coupe, temps de découpe estimé et nombre de morceaux de tracé.
+# Aucun SVG n'est construit : la surface vient des rectangles des panneaux
+# (panel_extents) et les tracés sont mesurés au fil des draw_* par PathMeasure,
+# une rangée de languettes étant mesurée d'un coup, quel que soit leur nombre.
+# Le SVG de la variante choisie peut ensuite être écrit.
+#
+#   python boite_brique_sweep.py 200 300 100 --tabs 1-9 --material pmma-3,pmma-5 --cover both
+#   python boite_brique_sweep.py 200 300 100 --tabs 2-6 --thickness 3,4,5 --kerf 0.2 --svg choix.svg --pick 1
+
+import argparse
+import itertools
+import sys
+import time
+from collections import namedtuple
+from math import hypot
+
+from boite_brique_export import DEFAULT_PROFILES
+from boite_brique_geometry import BoxGeometry, DEFAULTS, EXTERNAL_COLOR, options_from_spec
+
+# * Classement possible des variantes (champs de Variant)
+SORT_KEYS = ('area', 'cut', 'time', 'pieces', 'travel')
+BOOLEAN_CHOICES = {'yes': (True,), 'no': (False,), 'both': (False, True)}
+
+Variant = namedtuple('Variant', 'spec thickness area cut travel time pieces')
+
+
+class PathMeasure(object):
+    """ Same interface as PathBuffer but only measures the path while it is
+        drawn: cut length, pieces (drawn polylines), travel between the pieces
+        and number of commands. A run of tabs is measured in closed form.
+    """
+    __slots__ = ('x', 'y', 'length', 'travel', 'pieces', 'commands', 'start', 'end', 'drawing')
+
+    def __init__(self):
+        self.x = self.y = 0.0
+        self.length = self.travel = 0.0
+        self.pieces = self.commands = 0
+        self.start = self.end = None
+        self.drawing = False
+
+    def __len__(self):
+        return self.commands
+
+    def _draw(self):
+        # un tracé après un déplacement commence un nouveau morceau
+        if not self.drawing:
+            self.drawing = True
+            self.pieces += 1
+            if self.end is None:
+                self.start = (self.x, self.y)
+            else:
+                self.travel += hypot(self.x - self.end[0], self.y - self.end[1])
+
+    def move_to(self, x, y):
+        self.commands += 1
+        self.x, self.y = x, y
+        self.drawing = False
+
+    def move(self, dx, dy):
+        self.commands += 1
+        self.x += dx
+        self.y += dy
+        self.drawing = False
+
+    def skip(self, dx):
+        self.commands += 1
+        self.x += dx
+        self.drawing = False
+
+    def h(self, dx):
+        self.commands += 1
+        self._draw()
+        self.x += dx
+        self.length += abs(dx)
+        self.end = (self.x, self.y)
+
+    def v(self, dy):
+        self.commands += 1
+        self._draw()
+        self.y += dy
+        self.length += abs(dy)
+        self.end = (self.x, self.y)
+
+    def tabs(self, axis, first, out, middle, count):
+        count = int(count)
+        if count <= 0:
+            return
+        self.commands += 5*count
+        self._draw()
+        self.length += count*(2*abs(first) + abs(middle) + 2*abs(out))
+        if axis == 'h':
+            self.x += count*(2*first + middle)
+        else:
+            self.y += count*(2*first + middle)
+        self.end = (self.x, self.y)
+
+
+class BoxMeasure(BoxGeometry):
+    """ Box geometry whose panels() are PathMeasure instead of PathBuffer
+    """
+    path_class = PathMeasure
+
+
+def values(text, kind=float):
+    """ Parse a list of values "3,5" or of integer ranges "1-4,8"
+    """
+    result = []
+    for item in text.split(','):
+        item = item.strip()
+        if kind is int and '-' in item[1:]:
+            low, high = item.split('-', 1)
+            result.extend(range(int(low), int(high) + 1))
+        elif item:
+            result.append(kind(item))
+    if not result:
+        raise argparse.ArgumentTypeError("no value in %r" % text)
+    return result
+
+
+def variants(base, axes):
+    """ Yield one spec per combination of the axes, a list of (option name, values).
+        The dimensions of base are interior ones: with external_dimensions,
+        twice the thickness of the variant is added so that every variant has
+        the same interior.
+    """
+    names = [name for name, choices in axes]
+    for combination in itertools.product(*[choices for name, choices in axes]):
+        spec = dict(base)
+        spec.update(zip(names, combination))
+        if spec['external_dimensions']:
+            thickness = BoxGeometry.from_options(options_from_spec(spec)).materialThickness
+            for name in ('width', 'length', 'height'):
+                spec[name] += 2*thickness
+        yield spec
+
+
+def evaluate(spec, feed=None, rapid_speed=200.0):
+    """ Return the Variant of a spec, or None if the box cannot be made.
+        The laser time is the cut length at the feed (units/min, the one of
+        the material if any) plus the travel between pieces at rapid_speed
+        (units/s).
+    """
+    geometry = BoxMeasure.from_options(options_from_spec(spec))
+    try:
+        geometry.check_parameters()
+    except ValueError:
+        return None
+    area = sum((x1 - x0)*(y1 - y0) for suffix, (x0, y0, x1, y1) in geometry.panel_extents())
+    cut = travel = 0.0
+    pieces = 0
+    position = (0.0, 0.0)
+    for suffix, measure in geometry.panels():
+        if not measure.pieces:
+            continue
+        cut += measure.length
+        pieces += measure.pieces
+        travel += hypot(measure.start[0] - position[0], measure.start[1] - position[1]) + measure.travel
+        position = measure.end
+    if feed is None:
+        feed = DEFAULT_PROFILES[EXTERNAL_COLOR][0]
+        if geometry.material is not None and geometry.material.feed > 0.0:
+            feed = geometry.material.feed
+    seconds = cut / feed * 60.0 + travel / rapid_speed
+    return Variant(spec, geometry.materialThickness, area, cut, travel, seconds, pieces)
+
+
+def sweep(base, axes, feed=None, rapid_speed=200.0):
+    """ Return (the possible variants, number of impossible ones)
+    """
+    results = []
+    impossible = 0
+    for spec in variants(base, axes):
+        variant = evaluate(spec, feed, rapid_speed)
+        if variant is None:
+            impossible += 1
+        else:
+            results.append(variant)
+    return results, impossible
+
+
+def rank(results, keys=('area', 'time')):
+    """ Return the variants sorted on the keys (fields of Variant)
+    """
+    return sorted(results, key=lambda variant: tuple(getattr(variant, key) for key in keys))
+
+
+def rows(ranked):
+    """ Yield the table rows (lists of strings) of ranked variants, header first
+    """
+    yield ['rank', 'tabs W/L/H', 'material', 'thickness', 'external', 'cover', 'corners',
+           'area', 'cut', 'time (s)', 'pieces']
+    for index, variant in enumerate(ranked, 1):
+        spec = variant.spec
+        yield ['%d' % index,
+               '%d/%d/%d' % (spec['num_tab_Width'], spec['num_tab_Length'], spec['num_tab_Height']),
+               spec['materiaux'] if spec['bymaterial'] else '-',
+               '%g' % variant.thickness,
+               'yes' if spec['external_dimensions'] else 'no',
+               'yes' if spec['aveccouvercle'] else 'no',
+               'yes' if spec['corners'] else 'no',
+               '%.0f' % variant.area, '%.1f' % variant.cut, '%.1f' % variant.time, '%d' % variant.pieces]
+
+
+def write_table(table, stream):
+    """ Write rows aligned in columns
+    """
+    table = list(table)
+    widths = [max(len(row[column]) for row in table) for column in range(len(table[0]))]
+    for row in table:
+        stream.write('  '.join(cell.rjust(width) for cell, width in zip(row, widths)) + '\n')
+
+
+def write_svg(variant, filename):
+    """ Write the SVG document of one variant
+    """
+    from boite_brique_batch import render_box
+    from boite_brique_svg import open_output, svg_document
+    render = render_box(variant.spec, 'box')
+    with open_output(filename) as f:
+        f.write(svg_document([render.group], render.extents, render.options.units))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the variants of a tabbed box (material, cut, laser time)")
+    parser.add_argument("width", type=float, help="Interior width of the box")
+    parser.add_argument("length", type=float, help="Interior length of the box")
+    parser.add_argument("height", type=float, help="Interior height of the box")
+    parser.add_argument("--tabs",
+                        type=lambda text: values(text, int), default=None,
+                        help="Tab counts of the three directions, e.g. 1-9 or 2,4,6")
+    for name, option in (('Width', '--tabs-width'), ('Length', '--tabs-length'), ('Height', '--tabs-height')):
+        parser.add_argument(option,
+                            dest='num_tab_' + name, type=lambda text: values(text, int), default=None,
+                            help="Tab counts in %s (--tabs by default)" % name.lower())
+    material = parser.add_mutually_exclusive_group()
+    material.add_argument("--thickness",
+                          type=values, default=None,
+                          help="Material thicknesses, e.g. 3,5 (with --kerf)")
+    material.add_argument("--material",
+                          type=lambda text: values(text, str), default=None,
+                          help="Material ids of the catalogue, e.g. pmma-3,pmma-5 (thickness and kerf)")
+    parser.add_argument("--machine",
+                        default=DEFAULTS['machine'],
+                        help="Machine of the catalogue for --material")
+    parser.add_argument("--kerf",
+                        type=float, default=DEFAULTS['kerf_size'],
+                        help="Kerf with --thickness")
+    for option, dest in (('--external', 'external_dimensions'), ('--cover', 'aveccouvercle'), ('--corners', 'corners')):
+        parser.add_argument(option,
+                            dest=dest, choices=sorted(BOOLEAN_CHOICES), default=None,
+                            help="Value(s) of %s (the extension default if not given)" % dest)
+    parser.add_argument("--feed",
+                        type=float, default=None,
+                        help="Cutting feed in units/min (the material one, else %r)" % DEFAULT_PROFILES[EXTERNAL_COLOR][0])
+    parser.add_argument("--rapid-speed",
+                        dest="rapid_speed", type=float, default=200.0,
+                        help="Speed of the laser head between two cuts, in units/s")
+    parser.add_argument("--sort",
+                        type=lambda text: values(text, str), default=['area', 'time'],
+                        help="Ranking keys among %s (area,time by default)" % ', '.join(SORT_KEYS))
+    parser.add_argument("--top",
+                        type=int, default=20,
+                        help="Number of variants listed (0 for all)")
+    parser.add_argument("--csv",
+                        action="store_true",
+                        help="Write the table as CSV")
+    parser.add_argument("--svg",
+                        default=None,
+                        help="Write the SVG of the variant ranked --pick to this file")
+    parser.add_argument("--pick",
+                        type=int, default=1,
+                        help="Rank of the variant written with --svg")
+    args = parser.parse_args(argv)
+    unknown = [key for key in args.sort if key not in SORT_KEYS]
+    if unknown:
+        parser.error("unknown sort key(s): %s" % ', '.join(unknown))
+
+    base = dict(DEFAULTS, width=args.width, length=args.length, height=args.height)
+    axes = []
+    for name in ('num_tab_Width', 'num_tab_Length', 'num_tab_Height'):
+        axes.append((name, getattr(args, name) or args.tabs or [DEFAULTS[name]]))
+    if args.material:
+        base.update(bymaterial=True, machine=args.machine)
+        axes.append(('materiaux', args.material))
+    elif args.thickness:
+        base.update(bymaterial=False, kerf_size=args.kerf)
+        axes.append(('thickness', args.thickness))
+    for name in ('external_dimensions', 'aveccouvercle', 'corners'):
+        choice = getattr(args, name)
+        axes.append((name, BOOLEAN_CHOICES[choice] if choice else (DEFAULTS[name],)))
+
+    start = time.perf_counter()
+    try:
+        results, impossible = sweep(base, axes, args.feed, args.rapid_speed)
+    except ValueError as error: # matériau absent du catalogue
+        parser.error(str(error))
+    ranked = rank(results, args.sort)
+    sys.stderr.write("%d variant(s) evaluated in %.3f s, %d impossible\n"
+                     % (len(results) + impossible, time.perf_counter() - start, impossible))
+    listed = ranked[:args.top] if args.top > 0 else ranked
+    if args.csv:
+        import csv
+        csv.writer(sys.stdout, lineterminator='\n').writerows(rows(listed))
+    else:
+        write_table(rows(listed), sys.stdout)
+    if args.svg:
+        if not 1 <= args.pick <= len(ranked):
+            parser.error("--pick must be between 1 and %d" % len(ranked))
+        write_svg(ranked[args.pick - 1], args.svg)
+    return 0 if ranked else 1
+
+###
+if __name__ == '__main__':
+    sys.exit(main())
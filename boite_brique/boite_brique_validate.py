@@ -0,0 +1,333 @@
+#!/usr/bin/env/python
+'''
+Copyright (C)2011 Mark Schafer <neon.mark(a)gmaildotcom>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This    program    is    distributed in the    hope    that    it    will    be    useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+'''
+
+# Vérification d'une boite avant la découpe, sur les tracés produits :
+# - chaque panneau est un contour fermé (au dépassement de fermeture kerf/2 près),
+# - aucun contour ne se coupe ni ne se touche lui-même (balayage sur x des
+#   segments horizontaux et verticaux, puis recouvrements alignés),
+# - les panneaux ne se chevauchent pas,
+# - les languettes d'un bord entrent dans les encoches du bord en face :
+#   même nombre, mêmes positions, et une fois le trait de coupe retiré
+#   (languette - kerf, encoche + kerf) la languette n'est pas plus large
+#   (interférence) ni plus étroite (jeu) que l'encoche.
+# Les panneaux sont toujours vérifiés séparés (comme avec forcingseparation).
+#
+#   python boite_brique_validate.py commandes.jsonl
+
+import argparse
+import copy
+import sys
+from bisect import bisect_left, insort
+from collections import namedtuple
+from math import hypot
+
+from boite_brique_geometry import BoxGeometry, options_from_spec
+
+ERROR = 'error'
+WARNING = 'warning'
+
+# Nombre maximal de points de contact signalés par contour
+MAX_CROSSINGS = 10
+
+# * Dimension de la boite portée par chaque bord : (type de panneau, direction du bord)
+EDGE_DIMENSIONS = {
+    ('top_bottom', 'h'): 'width',  ('top_bottom', 'v'): 'length',
+    ('short_side', 'h'): 'width',  ('short_side', 'v'): 'height',
+    ('long_side', 'h'): 'height',  ('long_side', 'v'): 'length',
+}
+
+
+class Diagnostic(namedtuple('Diagnostic', 'level panel code message')):
+    """ One finding of the validator: level is 'error' or 'warning', panel the
+        panel id suffix (or 'box'), code a short machine readable name
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return '%s %s [%s]: %s' % (self.level, self.panel, self.code, self.message)
+
+
+def validate(geometry, tolerance=1e-6):
+    """ Return the list of Diagnostic of a box geometry, empty if it can be cut
+    """
+    try:
+        geometry.check_parameters()
+    except ValueError as error:
+        return [Diagnostic(ERROR, 'box', 'parameters', str(error))]
+    separated = copy.copy(geometry)
+    separated.forcing_separation = True
+    kerf = separated.kerf
+    thickness = separated.materialThickness
+    diagnostics = []
+    boxes = []
+    edges = []
+    for (suffix, kind, x, y, side, flag), (_, path) in zip(separated.panel_layout(), separated.panels()):
+        outlines = list(path.polylines())
+        for points in outlines:
+            gap = hypot(points[-1][0] - points[0][0], points[-1][1] - points[0][1])
+            if gap > kerf/2 + tolerance:
+                diagnostics.append(Diagnostic(ERROR, suffix, 'open-outline',
+                                              "outline is not closed (gap of %.4f)" % gap))
+                continue
+            points = closed_outline(points, tolerance)
+            for cx, cy, code in outline_crossings(points, tolerance):
+                diagnostics.append(Diagnostic(ERROR, suffix, code,
+                                              "outline touches itself at (%.4f, %.4f)" % (cx, cy)))
+        if len(outlines) != 1:
+            diagnostics.append(Diagnostic(ERROR, suffix, 'open-outline',
+                                          "%d outlines instead of one" % len(outlines)))
+            continue
+        extents = outline_extents(points)
+        boxes.append((suffix, extents))
+        for name in ('top', 'bottom', 'left', 'right'):
+            axis = 'h' if name in ('top', 'bottom') else 'v'
+            profile = edge_profile(points, extents, name, thickness, tolerance)
+            if profile is not None:
+                edges.append((EDGE_DIMENSIONS[(kind, axis)], kind, '%s %s edge' % (suffix, name)) + profile)
+    diagnostics.extend(panel_overlaps(boxes, tolerance))
+    diagnostics.extend(mating(edges, kerf, thickness, tolerance))
+    return diagnostics
+
+
+def validate_spec(spec, tolerance=1e-6):
+    """ Validate the box described by a spec mapping (see options_from_spec)
+    """
+    return validate(BoxGeometry.from_options(options_from_spec(spec)), tolerance)
+
+
+def closed_outline(points, tolerance=1e-6):
+    """ Return the points of a closed outline without the closing overcut
+        (the last point is the first one) nor zero length segments
+    """
+    cleaned = [points[0]]
+    for x, y in points[1:-1]:
+        px, py = cleaned[-1]
+        if abs(x - px) > tolerance or abs(y - py) > tolerance:
+            cleaned.append((x, y))
+    x0, y0 = points[0]
+    while len(cleaned) > 1 and abs(cleaned[-1][0] - x0) <= tolerance and abs(cleaned[-1][1] - y0) <= tolerance:
+        cleaned.pop()
+    cleaned.append(points[0])
+    return cleaned
+
+
+def outline_extents(points):
+    xs = [x for x, y in points]
+    ys = [y for x, y in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def outline_crossings(points, tolerance=1e-6, limit=MAX_CROSSINGS):
+    """ Return up to limit (x, y, code) where a closed orthogonal outline
+        crosses or touches itself ('self-intersection') or runs twice over
+        the same line ('overlap'). Consecutive segments only meet at their
+        common vertex.
+        Sweep line over x: the horizontal segments are active between their
+        ends, each vertical segment looks up the active ones in its y range.
+    """
+    count = len(points) - 1
+    horizontal = []
+    vertical = []
+    for i in range(count):
+        (x0, y0), (x1, y1) = points[i], points[i+1]
+        if abs(y1 - y0) <= tolerance:
+            horizontal.append((y0, min(x0, x1), max(x0, x1), i))
+        elif abs(x1 - x0) <= tolerance:
+            vertical.append((x0, min(y0, y1), max(y0, y1), i))
+
+    def adjacent(i, j):
+        return (i - j) % count in (1, count - 1)
+
+    found = []
+    # * recouvrements de segments alignés
+    for segments, as_point in ((horizontal, lambda c, u: (u, c)), (vertical, lambda c, u: (c, u))):
+        line = None
+        end = None
+        for key, low, high, c in sorted((round(c / tolerance), low, high, c) for c, low, high, i in segments):
+            if key == line and low < end - tolerance:
+                found.append(as_point(c, low) + ('overlap',))
+                if len(found) >= limit:
+                    return found
+            if key != line or high > end:
+                end = high
+            line = key
+    # * croisements et contacts horizontal / vertical
+    events = []
+    for y, low, high, i in horizontal:
+        events.append((low - tolerance, 0, y, i))
+        events.append((high + tolerance, 2, y, i))
+    for x, low, high, i in vertical:
+        events.append((x, 1, low, high, i))
+    events.sort()
+    active = []
+    for event in events:
+        if event[1] == 0:
+            insort(active, (event[2], event[3]))
+        elif event[1] == 2:
+            del active[bisect_left(active, (event[2], event[3]))]
+        else:
+            x, _, low, high, i = event
+            k = bisect_left(active, (low - tolerance, -1))
+            while k < len(active) and active[k][0] <= high + tolerance:
+                y, j = active[k]
+                if not adjacent(i, j):
+                    found.append((x, y, 'self-intersection'))
+                    if len(found) >= limit:
+                        return found
+                k += 1
+    return found
+
+
+def edge_profile(points, extents, side, thickness, tolerance=1e-6):
+    """ Return (protrusions, recesses) of one side of an outline, as lists of
+        (centre, width) along the side, centres measured from the middle of
+        the panel. Protrusions are the parts of the outline on the outer line
+        of the side, recesses the gaps between them.
+        Returns None for a plain side (one straight line, no tab).
+    """
+    xmin, ymin, xmax, ymax = extents
+    if side in ('top', 'bottom'):
+        line = ymin if side == 'top' else ymax
+        middle = (xmin + xmax) / 2
+        span = xmax - xmin
+        intervals = sorted((min(x0, x1), max(x0, x1))
+                           for (x0, y0), (x1, y1) in zip(points, points[1:])
+                           if abs(y0 - line) <= tolerance and abs(y1 - line) <= tolerance)
+    else:
+        line = xmin if side == 'left' else xmax
+        middle = (ymin + ymax) / 2
+        span = ymax - ymin
+        intervals = sorted((min(y0, y1), max(y0, y1))
+                           for (x0, y0), (x1, y1) in zip(points, points[1:])
+                           if abs(x0 - line) <= tolerance and abs(x1 - line) <= tolerance)
+    merged = []
+    for low, high in intervals:
+        if merged and low <= merged[-1][1] + tolerance:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    if len(merged) == 1 and merged[0][1] - merged[0][0] >= span - 2*thickness - tolerance:
+        return None
+    protrusions = [((low + high) / 2 - middle, high - low) for low, high in merged]
+    recesses = [((a[1] + b[0]) / 2 - middle, b[0] - a[1]) for a, b in zip(merged, merged[1:])]
+    return protrusions, recesses
+
+
+def panel_overlaps(boxes, tolerance=1e-6):
+    """ Yield an error for each pair of panels whose outlines' rectangles overlap
+    """
+    for i, (name, (x0, y0, x1, y1)) in enumerate(boxes):
+        for other, (a0, b0, a1, b1) in boxes[i+1:]:
+            if min(x1, a1) - max(x0, a0) > tolerance and min(y1, b1) - max(y0, b0) > tolerance:
+                yield Diagnostic(ERROR, name, 'panel-overlap', "panel overlaps the %s panel" % other)
+
+
+def mating(edges, kerf, thickness, tolerance=1e-6):
+    """ Check that the tabs of every edge fit the slots of the edges it is
+        assembled with (same box dimension, other kind of panel).
+        edges is a list of (dimension, kind, name, protrusions, recesses).
+        Identical pairs of profiles are only checked once.
+    """
+    diagnostics = []
+    checked = set()
+    for i, (dimension, kind, name, protrusions, recesses) in enumerate(edges):
+        for other_dimension, other_kind, other, other_protrusions, other_recesses in edges[i+1:]:
+            if other_dimension != dimension or other_kind == kind:
+                continue
+            # les languettes sont les saillies du bord qui en a autant que l'autre a de creux
+            if protrusions and len(protrusions) == len(other_recesses):
+                tabs, slots, tab_name, slot_name = protrusions, other_recesses, name, other
+            elif other_protrusions and len(other_protrusions) == len(recesses):
+                tabs, slots, tab_name, slot_name = other_protrusions, recesses, other, name
+            else:
+                diagnostics.append(Diagnostic(ERROR, name.split()[0], 'mating-count',
+                                              "%s has %d tab(s) and %d slot(s), %s has %d tab(s) and %d slot(s)"
+                                              % (name, len(protrusions), len(recesses), other,
+                                                 len(other_protrusions), len(other_recesses))))
+                continue
+            key = (tuple((round(c / tolerance), round(w / tolerance)) for c, w in tabs),
+                   tuple((round(c / tolerance), round(w / tolerance)) for c, w in slots))
+            if key in checked:
+                continue
+            checked.add(key)
+            diagnostics.extend(_fit(tabs, slots, tab_name, slot_name, kerf, thickness, tolerance))
+    return diagnostics
+
+
+def _fit(tabs, slots, tab_name, slot_name, kerf, thickness, tolerance):
+    panel = tab_name.split()[0]
+    tabs = sorted(tabs)
+    for slots in (sorted(slots), sorted((-c, w) for c, w in slots)): # le bord en face peut être retourné
+        if all(abs(t[0] - s[0]) <= tolerance for t, s in zip(tabs, slots)):
+            break
+    else:
+        yield Diagnostic(ERROR, panel, 'misaligned',
+                         "tabs of the %s are not in front of the slots of the %s" % (tab_name, slot_name))
+        return
+    # largeurs réelles après la découpe : la languette perd le trait de coupe, l'encoche le gagne
+    play = [(s[1] + kerf) - (t[1] - kerf) for t, s in zip(tabs, slots)]
+    if min(play) < -tolerance:
+        yield Diagnostic(ERROR, panel, 'interference',
+                         "tabs of the %s are %.4f wider than the slots of the %s"
+                         % (tab_name, -min(play), slot_name))
+    elif max(play) > tolerance:
+        yield Diagnostic(WARNING, panel, 'loose-fit',
+                         "tabs of the %s are %.4f narrower than the slots of the %s"
+                         % (tab_name, max(play), slot_name))
+    narrowest = min(t[1] for t in tabs) - kerf
+    if narrowest < thickness - tolerance:
+        yield Diagnostic(WARNING, panel, 'thin-tab',
+                         "tabs of the %s (%.4f) are narrower than the material thickness (%.4f)"
+                         % (tab_name, narrowest, thickness))
+
+
+def main(argv=None):
+    from boite_brique_batch import read_specs
+    parser = argparse.ArgumentParser(description="Check tabbed boxes before cutting them")
+    parser.add_argument("specs",
+                        help="CSV or JSON lines file of box specs ('-' for stdin)")
+    parser.add_argument("--format",
+                        choices=('csv', 'jsonl'), default=None,
+                        help="Format of the specs (guessed from the extension by default)")
+    parser.add_argument("--tolerance",
+                        type=float, default=1e-6,
+                        help="Distance under which two points are the same")
+    args = parser.parse_args(argv)
+    fmt = args.format
+    if fmt is None:
+        fmt = 'csv' if args.specs.lower().endswith('.csv') else 'jsonl'
+    stream = sys.stdin if args.specs == '-' else open(args.specs, newline='', encoding='utf-8')
+    errors = 0
+    try:
+        for index, spec in enumerate(read_specs(stream, fmt), 1):
+            name = spec.get('name') or 'box%d' % index
+            try:
+                diagnostics = validate_spec(spec, args.tolerance)
+            except Exception as error: # spec illisible
+                diagnostics = [Diagnostic(ERROR, 'box', 'spec', '%s: %s' % (type(error).__name__, error))]
+            for diagnostic in diagnostics:
+                sys.stdout.write("spec %d (%s): %s\n" % (index, name, diagnostic))
+            errors += any(diagnostic.level == ERROR for diagnostic in diagnostics)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return 1 if errors else 0
+
+###
+if __name__ == '__main__':
+    sys.exit(main())